@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+import pytz
+
+from flightCleaners import cleanFlightFromMXP, cleanFlightFromNRT, cleanFlightFromRKV, cleanFlightFromMIA, \
+    cleanFlightFromBOG, cleanFlightFromRPLL, cleanFlightFromATH, keepDepartedOrCancelled
+from flightScrapers import fetchMXP, parseMXP, fetchNRT, parseNRT, fetchRKV, parseRKV, fetchMIA, parseMIA, fetchBOG, \
+    parseBOG, fetchRPLL, parseRPLL, fetchATH, parseATH
+
+AIRPORTS = {}
+
+
+class AirportScraper:
+    """
+    Everything needed to scrape an airport: the request of the departures, the extraction of the raw flights,
+    the cleaning of each raw flight and the cadence of the scraping, optionally limited to some local hours
+    """
+
+    def __init__(self, name: str, iata: str, timezone: str, fetch: Callable, parse: Callable, clean: Callable,
+                 refreshInterval: int, activeHours=None, enabled=True):
+        """
+        :param name: a string containing the name of the airport
+        :param iata: a string containing the IATA of the airport
+        :param timezone: a string containing the timezone of the airport
+        :param fetch: function without parameters returning the departures
+        :param parse: function returning the list of raw flights from the departures
+        :param clean: function returning the cleaned flight from a raw flight and the IATAMatcher,
+        None if the flight has to be discarded
+        :param refreshInterval: number of seconds between two scrapes
+        :param activeHours: a tuple containing the first and the last local hour (excluded) the airport is scraped,
+        None to scrape it all day
+        :param enabled: false to keep the airport registered without scraping it
+        """
+        self.name = name
+        self.iata = iata
+        self.timezone = timezone
+        self.fetch = fetch
+        self.parse = parse
+        self.clean = clean
+        self.refreshInterval = refreshInterval
+        self.activeHours = activeHours
+        self.enabled = enabled
+
+    def nextRun(self, after: datetime) -> datetime:
+        """
+        Compute when the airport has to be scraped again
+        :param after: a timezone aware datetime of the last scrape
+        :return: a timezone aware datetime in UTC
+        """
+        candidate = after + timedelta(seconds=self.refreshInterval)
+        if self.activeHours is None:
+            return candidate
+        start, end = self.activeHours
+        zone = pytz.timezone(self.timezone)
+        local = candidate.astimezone(zone)
+        if start <= local.hour < end:
+            return candidate
+        day = local.date() if local.hour < start else local.date() + timedelta(1)
+        opening = zone.localize(datetime(day.year, day.month, day.day, start))
+        return opening.astimezone(timezone.utc)
+
+
+def registerAirport(airport: AirportScraper) -> AirportScraper:
+    """
+    Add an airport to the registry
+    :param airport: an AirportScraper object
+    :return: the airport registered
+    """
+    AIRPORTS[airport.name] = airport
+    return airport
+
+
+def getAirports(names=None) -> dict:
+    """
+    Returns the registered airports that are enabled
+    :param names: a list containing the names of the airports to return, None to return all of them
+    :return: a dict having the name of the airport as key and the AirportScraper as value
+    """
+    return {name: airport for name, airport in AIRPORTS.items()
+            if airport.enabled and (names is None or name in names)}
+
+
+def departedOrCancelled(clean: Callable) -> Callable:
+    """
+    Wrap a cleaning function so that the flights not departed or cancelled yet are discarded
+    :param clean: function returning the cleaned flight from a raw flight and the IATAMatcher
+    :return: function returning the cleaned flight, None if discarded
+    """
+    return lambda flight, matcher: keepDepartedOrCancelled(clean(flight, matcher))
+
+
+# the departures of yesterday are published at once
+registerAirport(AirportScraper("Malpensa", "MXP", "Europe/Rome", fetchMXP, parseMXP, cleanFlightFromMXP,
+                               24 * 60 * 60))
+# the board of today is searched by time slot, from the first slot to the end of the day
+registerAirport(AirportScraper("Narita", "NRT", "Asia/Tokyo", fetchNRT, parseNRT, cleanFlightFromNRT,
+                               60 * 60, activeHours=(6, 24)))
+registerAirport(AirportScraper("Rejkyavik", "RKV", "Atlantic/Reykjavik", fetchRKV, parseRKV, cleanFlightFromRKV,
+                               3 * 60 * 60))
+registerAirport(AirportScraper("Bogotà", "BOG", "America/Bogota", fetchBOG, parseBOG,
+                               departedOrCancelled(cleanFlightFromBOG), 60 * 60))
+registerAirport(AirportScraper("Miami", "MIA", "America/New_York", fetchMIA, parseMIA, cleanFlightFromMIA,
+                               60 * 60))
+registerAirport(AirportScraper("Manila", "RPLL", "Asia/Manila", fetchRPLL, parseRPLL,
+                               departedOrCancelled(cleanFlightFromRPLL), 60 * 60))
+registerAirport(AirportScraper("Atene", "ATH", "Europe/Athens", fetchATH, parseATH,
+                               departedOrCancelled(cleanFlightFromATH), 60 * 60))
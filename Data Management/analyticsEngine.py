@@ -0,0 +1,193 @@
+import math
+import os
+
+from correlations import CORRELATION_MEASURES, REPORT_KEYS
+from flightSnapshot import SNAPSHOT_PATH
+
+# measures of the airport report in the order they are written in the csv
+REPORT_MEASURES = ["meanWind", "meanDelays", "meanWindDelaysGt", "meanWindDelaysLte", "meanPrecipitation",
+                   "meanPrecDelaysGt", "meanPrecDelaysLte"]
+
+# counters of the flights used for the split measures, airports without flights have 0 as value
+SPLIT_COUNTS = {
+    "meanWindDelaysGt": "countWindGt",
+    "meanWindDelaysLte": "countWindLte",
+    "meanPrecDelaysGt": "countPrecGt",
+    "meanPrecDelaysLte": "countPrecLte",
+}
+
+
+def openAnalytics(path=SNAPSHOT_PATH, inMemory=True):
+    """
+    Open a DuckDB connection exposing the flights of the snapshot as the flights table,
+    only the last exported version of each flight is kept
+    :param path: a string containing the directory of the snapshot
+    :param inMemory: true to load the flights in memory, false to query the Parquet files in place
+    :return: a DuckDB connection
+    """
+    # only needed by the analytics engine
+    import duckdb
+
+    connection = duckdb.connect()
+    connection.execute("SET enable_progress_bar = false")
+    files = os.path.join(path, "**", "*.parquet").replace("'", "''")
+    kind = "TABLE" if inMemory else "VIEW"
+    # delays counts the minute boundaries as $dateDiff does, delay is the one of createDelaysColumn,
+    # both computed on the epochs since the calendar functions on timestamps with time zone are much slower
+    connection.execute(f"""
+        CREATE {kind} flights AS
+        SELECT * EXCLUDE (month, part),
+            floor(epoch(actualDep) / 60) - floor(epoch(scheduledDep) / 60) AS delays,
+            CASE WHEN actualDep >= scheduledDep THEN (epoch(actualDep) - epoch(scheduledDep)) / 60 END AS delay
+        FROM read_parquet('{files}', hive_partitioning = true,
+                          hive_types = {{'airportDep': VARCHAR, 'month': VARCHAR}})
+        QUALIFY row_number() OVER (PARTITION BY _id ORDER BY part DESC) = 1
+    """)
+    return connection
+
+
+def airportReport(connection) -> list:
+    """
+    QUERY returning, for each airport, the number of flights, the means of wind speed, precipitation and delays
+    and the mean of the delays of the flights above and below the airport means
+    :param connection: a connection returned by openAnalytics
+    :return: a list containing the query response, with the same keys of DBConnection.airportReport
+    """
+    cursor = connection.execute("""
+        WITH delays AS (
+            SELECT airportDep, wind_speed_100m, precipitation, delays,
+                AVG(wind_speed_100m) OVER (PARTITION BY airportDep) AS meanWind,
+                AVG(precipitation) OVER (PARTITION BY airportDep) AS meanPrecipitation
+            FROM flights
+        )
+        SELECT airportDep AS airport,
+            COUNT(*) AS countFlights,
+            ANY_VALUE(meanWind) AS meanWind,
+            AVG(delays) AS meanDelays,
+            AVG(delays) FILTER (WHERE wind_speed_100m > meanWind) AS meanWindDelaysGt,
+            COUNT(*) FILTER (WHERE wind_speed_100m > meanWind) AS countWindGt,
+            AVG(delays) FILTER (WHERE wind_speed_100m <= meanWind) AS meanWindDelaysLte,
+            COUNT(*) FILTER (WHERE wind_speed_100m <= meanWind) AS countWindLte,
+            ANY_VALUE(meanPrecipitation) AS meanPrecipitation,
+            AVG(delays) FILTER (WHERE precipitation > meanPrecipitation) AS meanPrecDelaysGt,
+            COUNT(*) FILTER (WHERE precipitation > meanPrecipitation) AS countPrecGt,
+            AVG(delays) FILTER (WHERE precipitation <= meanPrecipitation) AS meanPrecDelaysLte,
+            COUNT(*) FILTER (WHERE precipitation <= meanPrecipitation) AS countPrecLte
+        FROM delays
+        GROUP BY airportDep
+    """)
+    columns = [description[0] for description in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def correlationsQuery(grouped: bool) -> str:
+    """
+    Build the query of the Pearson coefficients between the delays and the weather measures,
+    negative delays are left out as in createDelaysColumn
+    :param grouped: true to compute the coefficients of each airport, false to compute the general ones
+    :return: a string containing the query
+    """
+    measures = ", ".join(f"corr({measure}, delay) AS {measure}" for measure in CORRELATION_MEASURES)
+    if grouped:
+        return f"SELECT airportDep AS airport, {measures} FROM flights GROUP BY airportDep"
+    return f"SELECT {measures} FROM flights"
+
+
+def toCoefficient(value):
+    """
+    Convert a coefficient returned by DuckDB as correlationStats does
+    :param value: the coefficient, None or NaN when it can not be computed
+    :return: the coefficient between -1 and 1, None if it can not be computed
+    """
+    if value is None or math.isnan(value):
+        return None
+    return min(max(value, -1.0), 1.0)
+
+
+def generalCorrelations(connection) -> dict:
+    """
+    QUERY returning the correlation between delays and weather measures over all the flights
+    :param connection: a connection returned by openAnalytics
+    :return: a dict having the measure as key and the coefficient as value
+    """
+    row = connection.execute(correlationsQuery(False)).fetchone()
+    return {measure: toCoefficient(value) for measure, value in zip(CORRELATION_MEASURES, row)}
+
+
+def airportCorrelations(connection) -> dict:
+    """
+    QUERY returning the correlation between delays and weather measures for each airport
+    :param connection: a connection returned by openAnalytics
+    :return: a dict having the airport as key and a dict with the coefficient of each measure as value
+    """
+    correlations = {}
+    for row in connection.execute(correlationsQuery(True)).fetchall():
+        correlations[row[0]] = {measure: toCoefficient(value) for measure, value in zip(CORRELATION_MEASURES, row[1:])}
+    return correlations
+
+
+def qualityMeasures(connection, iatas: list) -> dict:
+    """
+    QUERY returning the quality measures of dataQuality over the flights
+    :param connection: a connection returned by openAnalytics
+    :param iatas: a list containing all the iata acronyms
+    :return: a dict containing the quality dimensions
+    """
+    acronyms = [iata["acronym"] for iata in iatas]
+    completeness, consistency = connection.execute("""
+        SELECT AVG(CASE WHEN actualDep IS NOT NULL THEN 1.0 ELSE 0.0 END),
+            AVG(CASE WHEN list_contains($acronyms, airportDep) THEN 1.0 ELSE 0.0 END)
+        FROM flights
+    """, {"acronyms": acronyms}).fetchone()
+    return {"completeness": completeness, "consistency": consistency}
+
+
+def roundValue(value):
+    """
+    :param value: a measure of the report
+    :return: the measure rounded as printed in the report, None if missing
+    """
+    return None if value is None else round(value, 3)
+
+
+def buildReport(connection, airportNames=None) -> dict:
+    """
+    Build the report printed to csv by analysisAndQuery, with the same keys, rounding and default values
+    :param connection: a connection returned by openAnalytics
+    :param airportNames: a list of airport names, None to use the airports of the flights
+    :return: a dict having the measure as key and a dict with the value of each airport as value
+    """
+    rows = {row["airport"]: row for row in airportReport(connection)}
+    if airportNames is None:
+        airportNames = list(rows)
+
+    report = {"countFlights": {}}
+    for airport in airportNames:
+        report["countFlights"][airport] = rows[airport]["countFlights"] if airport in rows else 0
+
+    correlations = airportCorrelations(connection)
+    for measure, key in REPORT_KEYS.items():
+        report[key] = {}
+        for airport in airportNames:
+            value = correlations.get(airport, {}).get(measure)
+            report[key][airport] = None if value is None else round(float(value), 3)
+
+    for measure in REPORT_MEASURES:
+        report[measure] = {}
+        for airport in airportNames:
+            # airports without flights used for the measure have 0 as value
+            if airport not in rows or (measure in SPLIT_COUNTS and rows[airport][SPLIT_COUNTS[measure]] == 0):
+                report[measure][airport] = 0
+            else:
+                report[measure][airport] = roundValue(rows[airport][measure])
+
+    for key, suffix in [("windPercentageIncrese", "Wind"), ("precPercentageIncrese", "Prec")]:
+        report[key] = {}
+        for airport in airportNames:
+            lte = report[f"mean{suffix}DelaysLte"][airport]
+            gt = report[f"mean{suffix}DelaysGt"][airport]
+            if gt is None or lte is None or lte == 0:
+                report[key][airport] = None
+            else:
+                report[key][airport] = round(((gt / lte) - 1) * 100, 3)
+    return report
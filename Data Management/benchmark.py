@@ -0,0 +1,220 @@
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from airportRegistry import getAirports
+from analyticsEngine import openAnalytics, buildReport
+from datetimeParsing import localizeDatetime, localizeMany
+from httpFixtures import FIXTURES_PATH, useFixtures
+from iataMatcher import IATAMatcher
+from iataReference import loadIATAReference
+from utils import createDelaysColumn
+
+
+def syntheticFlights(size: int, seed=0) -> pd.DataFrame:
+    """
+    Create a dataframe of random flights shaped like the one built from the database
+    :param size: number of flights to create
+    :param seed: seed of the random generator
+    :return: a dataframe containing the flights
+    """
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2023-12-01T00:00")
+    scheduled = start + rng.integers(0, 90 * 24 * 60, size).astype("timedelta64[m]")
+    actual = scheduled + rng.integers(-30, 180, size).astype("timedelta64[m]")
+    actual = pd.Series(pd.to_datetime(actual).to_pydatetime(), dtype=object)
+    # cancelled flights have no actual departure
+    actual[rng.random(size) < 0.05] = None
+    return pd.DataFrame({
+        "_id": np.arange(size),
+        "airportDep": rng.choice(["MXP", "NRT", "RKV", "BOG", "MIA", "RPLL", "ATH"], size),
+        "scheduledDep": pd.Series(pd.to_datetime(scheduled).to_pydatetime(), dtype=object),
+        "actualDep": actual,
+    })
+
+
+def loopDelays(dataframe: pd.DataFrame) -> list:
+    """
+    Row by row delay computation, used as a reference for the vectorized one
+    :param dataframe: a dataframe containing flights information
+    :return: a list containing the delays
+    """
+    delays = []
+    for objId in dataframe.index:
+        flight = dataframe.loc[objId]
+        delay = None
+        if flight["actualDep"] is not None:
+            delay = (flight["actualDep"] - flight["scheduledDep"]).total_seconds() / 60
+            if delay < 0:
+                delay = None
+        delays.append(delay)
+    return delays
+
+
+def benchmarkDelays(size=1_000_000, loopSize=20_000) -> dict:
+    """
+    Measure the throughput of the delay computation, the row by row version runs on a smaller
+    frame since it would take minutes on the full one
+    :param size: number of flights for the vectorized computation
+    :param loopSize: number of flights for the row by row computation
+    :return: a dict containing the flights per second of both versions
+    """
+    dataframe = syntheticFlights(size)
+    start = time.perf_counter()
+    createDelaysColumn(dataframe)
+    vectorized = size / (time.perf_counter() - start)
+
+    dataframe = syntheticFlights(loopSize)
+    start = time.perf_counter()
+    loopDelays(dataframe)
+    loop = loopSize / (time.perf_counter() - start)
+
+    return {"vectorized": vectorized, "loop": loop, "speedup": vectorized / loop}
+
+
+def benchmarkScrapers(path=FIXTURES_PATH, scale=100, names=None) -> dict:
+    """
+    Measure fetch, parse and clean of each airport on the recorded responses, without using the network,
+    the records of each response are repeated to simulate bigger airports
+    :param path: a string containing the directory of the fixtures
+    :param scale: number of times the records of each response are repeated
+    :param names: a list containing the names of the airports to measure, None to measure all of them
+    :return: a dict having the name of the airport as key and a dict as value, the inner dict contains
+    the number of records and flights, the records per second of each phase and the peak of memory in bytes
+    """
+    useFixtures("replay", path, scale)
+    try:
+        iatas, digest = loadIATAReference()
+    except FileNotFoundError:
+        iatas = []
+    matcher = IATAMatcher(iatas)
+
+    results = {}
+    for name, airport in getAirports(names).items():
+        tracemalloc.start()
+        try:
+            start = time.perf_counter()
+            raw = airport.fetch()
+            fetchSeconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            records = airport.parse(raw)
+            parseSeconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            flights = [airport.clean(record, matcher) for record in records]
+            cleanSeconds = time.perf_counter() - start
+        except Exception as e:
+            tracemalloc.stop()
+            results[name] = {"error": repr(e)}
+            continue
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results[name] = {
+            "records": len(records),
+            "flights": len([flight for flight in flights if flight is not None]),
+            "fetch": len(records) / max(fetchSeconds, 1e-9),
+            "parse": len(records) / max(parseSeconds, 1e-9),
+            "clean": len(records) / max(cleanSeconds, 1e-9),
+            "peakMemory": peak,
+        }
+    return results
+
+
+def benchmarkAnalytics(size=2_000_000, seed=0) -> dict:
+    """
+    Measure the time taken by the analytics engine to compute the whole report on a snapshot of random flights
+    :param size: number of flights in the snapshot
+    :param seed: seed of the random generator
+    :return: a dict containing the seconds to load the snapshot and to compute the report
+    """
+    rng = np.random.default_rng(seed)
+    dataframe = syntheticFlights(size, seed)
+    dataframe["_id"] = dataframe["_id"].astype(str)
+    dataframe["scheduledDep"] = pd.to_datetime(dataframe["scheduledDep"], utc=True)
+    dataframe["actualDep"] = pd.to_datetime(dataframe["actualDep"], utc=True)
+    for measure in ["precipitation", "cloud_cover", "wind_speed_10m", "wind_speed_100m"]:
+        dataframe[measure] = rng.gamma(2, 5, size)
+    dataframe["month"] = dataframe["scheduledDep"].dt.strftime("%Y-%m")
+    dataframe["part"] = 1
+
+    with tempfile.TemporaryDirectory() as path:
+        dataframe.to_parquet(path, partition_cols=["airportDep", "month"], index=False)
+        start = time.perf_counter()
+        connection = openAnalytics(path)
+        load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        buildReport(connection)
+        report = time.perf_counter() - start
+        connection.close()
+    return {"load": load, "report": report}
+
+
+def strptimeDatetime(date: str, time: str, timezone: str) -> datetime:
+    """
+    Previous getDatetime, used as a reference for the cached parsing
+    :param date: a string containing the date in the format YYYY-MM-DD
+    :param time: a string containing the time in the format HH:MM
+    :param timezone: a string containing the timezone
+    :return: a datetime with updated time based on the time zone
+    """
+    tz = pytz.timezone(timezone)
+    return tz.localize(datetime.strptime(date + " " + time, '%Y-%m-%d %H:%M'))
+
+
+def benchmarkDatetime(size=200_000, timezone="Europe/Rome", seed=0) -> dict:
+    """
+    Measure the throughput of the datetime parsing of the cleaners
+    :param size: number of dates and times to parse
+    :param timezone: a string containing the timezone of the dates
+    :param seed: seed of the random generator
+    :return: a dict containing the datetimes per second of the previous, the scalar and the batch parsing
+    """
+    moments = syntheticFlights(size, seed)["scheduledDep"]
+    dates = [moment.strftime("%Y-%m-%d") for moment in moments]
+    times = [moment.strftime("%H:%M") for moment in moments]
+
+    results = {}
+    for name, function in [("strptime", strptimeDatetime), ("scalar", localizeDatetime)]:
+        start = time.perf_counter()
+        for date, hour in zip(dates, times):
+            function(date, hour, timezone)
+        results[name] = size / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    localizeMany(dates, times, timezone)
+    results["batch"] = size / (time.perf_counter() - start)
+    return results
+
+
+if __name__ == '__main__':
+    results = benchmarkDelays()
+    print(f"createDelaysColumn: {round(results['vectorized'])} flights/s")
+    print(f"row by row: {round(results['loop'])} flights/s")
+    print(f"speedup: {round(results['speedup'], 1)}x")
+
+    results = benchmarkDatetime()
+    print(f"getDatetime: strptime {round(results['strptime'])}/s, cached {round(results['scalar'])}/s, "
+          f"batch {round(results['batch'])}/s")
+
+    results = benchmarkAnalytics()
+    print(f"analytics engine: snapshot loaded in {round(results['load'], 3)}s, "
+          f"report computed in {round(results['report'], 3)}s")
+
+    if os.path.isdir(FIXTURES_PATH):
+        print()
+        for name, result in benchmarkScrapers().items():
+            if "error" in result:
+                print(f"{name}: {result['error']}")
+                continue
+            print(f"{name}: {result['records']} records, {result['flights']} flights, "
+                  f"fetch {round(result['fetch'])}/s, parse {round(result['parse'])}/s, "
+                  f"clean {round(result['clean'])}/s, peak {round(result['peakMemory'] / 2 ** 20, 1)} MiB")
@@ -0,0 +1,156 @@
+import heapq
+import json
+import time
+from datetime import datetime, timezone
+
+from airportRegistry import getAirports
+from iataMatcher import IATAMatcher
+from iataReference import loadIATAReference, syncIATA, IATA_PDF_PATH, IATA_ARTIFACT_PATH
+from scrapingEngine import runAirports
+from storage import FlightStorage
+
+METRICS_PATH = "collector.jsonl"
+
+# seconds between two checks of the IATA reference while the collector is running
+IATA_REFRESH = 24 * 60 * 60
+
+# longest sleep of the collector, so a stop is noticed quickly
+MAX_SLEEP = 60
+
+# seconds between two enrichments of the collector when no flight is inserted, so the pending flights are retried
+ENRICH_INTERVAL = 60 * 60
+
+
+def collectFlights(conn: FlightStorage, airports: dict, matcher: IATAMatcher, store=None, maxWorkers=4,
+                   timeout=120.0) -> dict:
+    """
+    Get the flights from the airports concurrently, the flights of each airport are loaded in MongoDB
+    as soon as it is scraped while the others are still running
+    :param conn: connection object
+    :param airports: a dict having the name of the airport as key and the AirportScraper as value
+    :param matcher: IATAMatcher built from the list of all IATAs
+    :param store: StatsStore updated with the flights inserted, None to skip it
+    :param maxWorkers: maximum number of airports scraped at the same time
+    :param timeout: maximum number of seconds to wait for each airport
+    :return: a dict containing the metrics of the cycle
+    """
+    started = time.monotonic()
+    counts = {}
+
+    def sink(name: str, flights: list) -> None:
+        counts[name] = conn.bulkUpsertFlights(flights)
+        if store is not None:
+            store.addFlights(counts[name]["insertedFlights"])
+
+    results = runAirports(airports, matcher, sink, maxWorkers=maxWorkers, timeout=timeout)
+    if store is not None:
+        store.save()
+
+    metrics = {"time": datetime.now().isoformat(timespec="seconds"), "airports": {}, "scraped": 0, "inserted": 0,
+               "matched": 0, "failed": 0}
+    for name, result in results.items():
+        airportCounts = counts.get(name, {"inserted": 0, "matched": 0, "failed": 0})
+        metrics["airports"][name] = {"flights": len(result["flights"]), "inserted": airportCounts["inserted"],
+                                     "error": result["error"], "seconds": round(result["seconds"], 3),
+                                     "phases": result["phases"]}
+        metrics["scraped"] += len(result["flights"])
+        for key in ["inserted", "matched", "failed"]:
+            metrics[key] += airportCounts[key]
+    metrics["seconds"] = round(time.monotonic() - started, 3)
+    return metrics
+
+
+def appendMetrics(metrics: dict, path=METRICS_PATH) -> None:
+    """
+    Append the metrics of a cycle as a json line
+    :param metrics: a dict containing the metrics
+    :param path: a string containing the path of the metrics file
+    :return: None
+    """
+    f = open(path, "a", encoding="utf8")
+    f.write(json.dumps(metrics, ensure_ascii=False, default=str) + "\n")
+    f.close()
+
+
+def loadMatcher(conn: FlightStorage, iataPaths=(IATA_PDF_PATH, IATA_ARTIFACT_PATH)) -> (IATAMatcher, str):
+    """
+    Load the IATA reference, sync it to the database and build the matcher
+    :param conn: connection object
+    :param iataPaths: a tuple containing the paths of the pdf and of the artifact of the IATA reference
+    :return: an IATAMatcher object and a string containing the hash of the IATA reference
+    """
+    iatas, digest = loadIATAReference(*iataPaths)
+    syncIATA(conn, iatas, digest)
+    return IATAMatcher(iatas), digest
+
+
+def runCollector(conn: FlightStorage, store=None, enrich=None, airports=None, maxWorkers=4, timeout=120.0,
+                 metricsPath=METRICS_PATH, maxCycles=None, iataPaths=(IATA_PDF_PATH, IATA_ARTIFACT_PATH)) -> None:
+    """
+    Scrape each airport on its own cadence until stopped, connection, HTTP session and IATA matcher
+    are created once and kept for all the cycles, the airports due at the same time are scraped together
+    :param conn: connection object
+    :param store: StatsStore updated with the flights inserted, None to skip it
+    :param enrich: function adding the weather to the new flights, called after the cycles inserting flights
+    and at least every ENRICH_INTERVAL seconds to retry the pending ones, None to skip the enrichment
+    :param airports: a dict having the name of the airport as key and the AirportScraper as value,
+    None to scrape all the registered airports
+    :param maxWorkers: maximum number of airports scraped at the same time
+    :param timeout: maximum number of seconds to wait for each airport
+    :param metricsPath: a string containing the path of the metrics file
+    :param maxCycles: number of cycles to run, None to run until interrupted
+    :param iataPaths: a tuple containing the paths of the pdf and of the artifact of the IATA reference
+    :return: None
+    """
+    if airports is None:
+        airports = getAirports()
+    if len(airports) == 0:
+        raise ValueError("No airports to scrape")
+    matcher, digest = loadMatcher(conn, iataPaths)
+    iataChecked = time.monotonic()
+    enriched = None
+
+    now = datetime.now(timezone.utc)
+    queue = [(now, name) for name in airports]
+    heapq.heapify(queue)
+    cycles = 0
+
+    try:
+        while maxCycles is None or cycles < maxCycles:
+            now = datetime.now(timezone.utc)
+            if queue[0][0] > now:
+                time.sleep(min((queue[0][0] - now).total_seconds(), MAX_SLEEP))
+                continue
+
+            due = []
+            while len(queue) > 0 and queue[0][0] <= now:
+                due.append(heapq.heappop(queue)[1])
+
+            try:
+                if time.monotonic() - iataChecked > IATA_REFRESH:
+                    iataChecked = time.monotonic()
+                    iatas, newDigest = loadIATAReference(*iataPaths)
+                    if newDigest != digest:
+                        syncIATA(conn, iatas, newDigest)
+                        matcher, digest = IATAMatcher(iatas), newDigest
+
+                print(f"Scraping {', '.join(due)}..")
+                metrics = collectFlights(conn, {name: airports[name] for name in due}, matcher, store, maxWorkers,
+                                         timeout)
+                if enrich is not None and (metrics["inserted"] > 0 or enriched is None
+                                           or time.monotonic() - enriched > ENRICH_INTERVAL):
+                    started = time.monotonic()
+                    enrich()
+                    enriched = time.monotonic()
+                    metrics["enrichSeconds"] = round(enriched - started, 3)
+            except Exception as e:
+                # a failed cycle is recorded and retried at the next run of its airports
+                metrics = {"time": datetime.now().isoformat(timespec="seconds"), "airports": due, "error": repr(e)}
+                print(f"[-] Ciclo fallito: {repr(e)}")
+            appendMetrics(metrics, metricsPath)
+
+            for name in due:
+                heapq.heappush(queue, (airports[name].nextRun(now), name))
+            cycles += 1
+    except KeyboardInterrupt:
+        print("Collector stopped")
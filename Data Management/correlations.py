@@ -0,0 +1,153 @@
+import numpy as np
+import pandas
+import pandas as pd
+
+CORRELATION_MEASURES = ["precipitation", "cloud_cover", "wind_speed_10m", "wind_speed_100m"]
+
+# keys used in the report for the correlation of each measure with the delays
+REPORT_KEYS = {
+    "precipitation": "corrPrecipitation",
+    "cloud_cover": "corrCloudCover",
+    "wind_speed_10m": "corrWind10m",
+    "wind_speed_100m": "corrWind100m",
+}
+
+STATS_COLUMNS = ["n", "meanX", "meanY", "m2X", "m2Y", "cXY"]
+
+# values whose squared deviations sum to less than this fraction of their squared mean are taken as constant,
+# as the rounding of the mean leaves a tiny variance where there is none
+RELATIVE_TOLERANCE = 1e-10
+
+
+def correlationStats(dataframe: pandas.DataFrame, groupColumn="airportDep", target="delay",
+                     measures=CORRELATION_MEASURES) -> pandas.DataFrame:
+    """
+    Compute in two passes over the groups the statistics of the correlation between the target and each measure,
+    only the rows having both values are used as in DataFrame.corr. The deviations are summed from the means
+    of the groups, so large values do not cancel out as with the sums of squares
+    :param dataframe: a dataframe containing the flights
+    :param groupColumn: a string containing the column to group by
+    :param target: a string containing the column correlated with the measures
+    :param measures: a list containing the columns correlated with the target
+    :return: a dataframe indexed by group and measure containing count, means, sums of squared deviations and
+    sum of the cross deviations, statistics of different dataframes are merged with poolCorrelationStats
+    """
+    codes, airports = pd.factorize(dataframe[groupColumn])
+    # rows without a group are left out
+    grouped = codes >= 0
+    codes = codes[grouped]
+    y = dataframe[target].astype(float).to_numpy()[grouped]
+    index = pd.MultiIndex.from_product([airports, measures], names=["airport", "measure"])
+    stats = {column: np.zeros((len(airports), len(measures))) for column in STATS_COLUMNS}
+    for i, measure in enumerate(measures):
+        x = dataframe[measure].astype(float).to_numpy()[grouped]
+        both = ~np.isnan(x) & ~np.isnan(y)
+        xs = x[both]
+        ys = y[both]
+        groups = codes[both]
+        n = np.bincount(groups, minlength=len(airports))
+        # groups without values keep zero means
+        meanX = np.divide(np.bincount(groups, weights=xs, minlength=len(airports)), n, out=np.zeros(len(n)),
+                          where=n > 0)
+        meanY = np.divide(np.bincount(groups, weights=ys, minlength=len(airports)), n, out=np.zeros(len(n)),
+                          where=n > 0)
+        dx = xs - meanX[groups]
+        dy = ys - meanY[groups]
+        stats["n"][:, i] = n
+        stats["meanX"][:, i] = meanX
+        stats["meanY"][:, i] = meanY
+        stats["m2X"][:, i] = np.bincount(groups, weights=dx * dx, minlength=len(airports))
+        stats["m2Y"][:, i] = np.bincount(groups, weights=dy * dy, minlength=len(airports))
+        stats["cXY"][:, i] = np.bincount(groups, weights=dx * dy, minlength=len(airports))
+    return pd.DataFrame({column: values.ravel() for column, values in stats.items()}, index=index)
+
+
+def poolCorrelationStats(stats: pandas.DataFrame, level="measure") -> pandas.DataFrame:
+    """
+    Merge the statistics of the groups sharing the given index level with the pairwise formulas of Chan et al.,
+    as the ones of all the airports in the general ones or the ones of two dataframes concatenated
+    :param stats: a dataframe returned by correlationStats
+    :param level: a string or list containing the index levels kept
+    :return: a dataframe indexed by the given levels containing the merged statistics
+    """
+    n = stats["n"].groupby(level=level, sort=False).transform("sum").where(lambda total: total > 0)
+    # groups without values keep zero means
+    meanX = ((stats["n"] * stats["meanX"]).groupby(level=level, sort=False).transform("sum") / n).fillna(0.0)
+    meanY = ((stats["n"] * stats["meanY"]).groupby(level=level, sort=False).transform("sum") / n).fillna(0.0)
+    # deviations of the group means from the merged means
+    dx = stats["meanX"] - meanX
+    dy = stats["meanY"] - meanY
+    parts = pd.DataFrame({"n": stats["n"], "meanX": meanX, "meanY": meanY,
+                          "m2X": stats["m2X"] + stats["n"] * dx * dx, "m2Y": stats["m2Y"] + stats["n"] * dy * dy,
+                          "cXY": stats["cXY"] + stats["n"] * dx * dy})
+    return parts.groupby(level=level, sort=False).agg({"n": "sum", "meanX": "first", "meanY": "first", "m2X": "sum",
+                                                        "m2Y": "sum", "cXY": "sum"})
+
+
+def pearsonFromStats(stats: pandas.DataFrame) -> pandas.Series:
+    """
+    Compute the Pearson coefficients from the statistics
+    :param stats: a dataframe returned by correlationStats or poolCorrelationStats
+    :return: a series containing the coefficients, NaN with less than two values or constant values
+    """
+    n = stats["n"]
+    constantX = stats["m2X"] <= n * (RELATIVE_TOLERANCE * stats["meanX"]) ** 2
+    constantY = stats["m2Y"] <= n * (RELATIVE_TOLERANCE * stats["meanY"]) ** 2
+    denominator = np.sqrt(stats["m2X"] * stats["m2Y"])
+    pearson = stats["cXY"] / denominator.where(~constantX & ~constantY & (denominator > 0))
+    return pearson.where(n >= 2).clip(-1, 1)
+
+
+def spearmanCorrelations(dataframe: pandas.DataFrame, groupColumn="airportDep", target="delay",
+                         measures=CORRELATION_MEASURES) -> pandas.Series:
+    """
+    Compute the Spearman coefficients ranking the values inside each group
+    :param dataframe: a dataframe containing the flights
+    :param groupColumn: a string containing the column to group by
+    :param target: a string containing the column correlated with the measures
+    :param measures: a list containing the columns correlated with the target
+    :return: a series indexed by group and measure containing the coefficients
+    """
+    coefficients = []
+    for measure in measures:
+        subset = dataframe.loc[dataframe[target].notna() & dataframe[measure].notna(), [groupColumn, target, measure]]
+        ranks = subset.groupby(groupColumn)[[target, measure]].rank()
+        ranks[groupColumn] = subset[groupColumn]
+        stats = correlationStats(ranks, groupColumn, target, [measure])
+        coefficients.append(pearsonFromStats(stats))
+    return pd.concat(coefficients)
+
+
+def groupedCorrelations(dataframe: pandas.DataFrame, groupColumn="airportDep", spearman=False,
+                        stats=None) -> pandas.DataFrame:
+    """
+    Correlation between delays and weather measures for each airport
+    :param dataframe: a dataframe containing the flights
+    :param groupColumn: a string containing the column to group by
+    :param spearman: true to compute also the Spearman coefficients
+    :param stats: a dataframe returned by correlationStats to use instead of computing it
+    :return: a dataframe with a row for each airport and measure containing number of flights and coefficients
+    """
+    if stats is None:
+        stats = correlationStats(dataframe, groupColumn)
+    table = pd.DataFrame({"n": stats["n"].astype(np.int64), "pearson": pearsonFromStats(stats)})
+    if spearman:
+        table["spearman"] = spearmanCorrelations(dataframe, groupColumn)
+    return table.reset_index()
+
+
+def correlationsToReport(table: pandas.DataFrame, airportNames: list, report: dict) -> dict:
+    """
+    Add the Pearson coefficients to the report printed to csv
+    :param table: a dataframe returned by groupedCorrelations
+    :param airportNames: a list of airport names in the database
+    :param report: a dict containing the previous query responses
+    :return: a dict containing the report updated
+    """
+    for measure, key in REPORT_KEYS.items():
+        values = table.loc[table["measure"] == measure].set_index("airport")["pearson"]
+        report[key] = {}
+        for airport in airportNames:
+            value = values.get(airport, np.nan)
+            report[key][airport] = None if pd.isna(value) else round(float(value), 3)
+    return report
@@ -0,0 +1,121 @@
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import pandas
+import pandas as pd
+import pytz
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M"
+
+# larger than any utc offset, local times farther than this from a transition have a single offset
+TRANSITION_MARGIN = timedelta(days=1)
+
+
+@lru_cache(maxsize=None)
+def getTimezone(timezone: str):
+    """
+    Returns the timezone object, each timezone is loaded only once
+    :param timezone: a string containing the timezone
+    :return: the pytz timezone
+    """
+    return pytz.timezone(timezone)
+
+
+def isNumber(part: str, minLength: int, maxLength: int) -> bool:
+    """
+    :param part: a string containing a field of the date or the time
+    :param minLength: minimum number of digits of the field
+    :param maxLength: maximum number of digits of the field
+    :return: true if the field is made only of ascii digits in the number given
+    """
+    return minLength <= len(part) <= maxLength and part.isascii() and part.isdigit()
+
+
+def parseDatetime(date: str, time: str) -> datetime:
+    """
+    Parse a date and a time in the format YYYY-MM-DD HH:MM splitting the fields,
+    the strings in any other form accepted by strptime are parsed by strptime
+    :param date: a string containing the date in the format YYYY-MM-DD
+    :param time: a string containing the time in the format HH:MM
+    :return: a naive datetime
+    """
+    dateParts = date.split("-")
+    timeParts = time.split(":")
+    if len(dateParts) == 3 and len(timeParts) == 2:
+        year, month, day = dateParts
+        hour, minute = timeParts
+        # as strptime, the year has 4 digits and the other fields 1 or 2 digits
+        if isNumber(year, 4, 4) and isNumber(month, 1, 2) and isNumber(day, 1, 2) \
+                and isNumber(hour, 1, 2) and isNumber(minute, 1, 2):
+            return datetime(int(year), int(month), int(day), int(hour), int(minute))
+    return datetime.strptime(date + " " + time, DATETIME_FORMAT)
+
+
+def transitionTzinfo(tz, naive: datetime):
+    """
+    Find with a binary search the offset of a time far from the transitions of a pytz timezone,
+    the transitions are read from the private attributes of the pytz timezones only here
+    :param tz: a pytz timezone
+    :param naive: a naive datetime
+    :return: the tzinfo of the time, None if the time is near a transition or the timezone has not the attributes
+    """
+    transitions = getattr(tz, "_utc_transition_times", None)
+    transitionInfo = getattr(tz, "_transition_info", None)
+    tzinfos = getattr(tz, "_tzinfos", None)
+    # timezones with a fixed offset have no transitions
+    if transitions is None or transitionInfo is None or tzinfos is None or len(transitions) != len(transitionInfo):
+        return None
+    index = bisect_right(transitions, naive) - 1
+    if index >= 0 and naive - transitions[index] > TRANSITION_MARGIN \
+            and (index + 1 == len(transitions) or transitions[index + 1] - naive > TRANSITION_MARGIN):
+        return tzinfos.get(transitionInfo[index])
+    return None
+
+
+def localize(tz, naive: datetime) -> datetime:
+    """
+    Same as tz.localize(naive, is_dst=False), the offset of the times far from the transitions of the timezone
+    is found with a binary search instead of trying all the offsets of the timezone
+    :param tz: a pytz timezone
+    :param naive: a naive datetime
+    :return: a datetime localized in the timezone
+    """
+    tzinfo = transitionTzinfo(tz, naive)
+    if tzinfo is None:
+        return tz.localize(naive, is_dst=False)
+    return naive.replace(tzinfo=tzinfo)
+
+
+def localizeDatetime(date: str, time: str, timezone: str) -> datetime:
+    """
+    Converts string formatted date to datetime considering timezone, times repeated when the clocks go back
+    are taken in standard time and times skipped when the clocks go forward keep the standard offset
+    :param date: a string containing the date in the format YYYY-MM-DD
+    :param time: a string containing the time in the format HH:MM
+    :param timezone: a string containing the timezone
+    :return: a datetime with updated time based on the time zone
+    """
+    return localize(getTimezone(timezone), parseDatetime(date, time))
+
+
+def localizeMany(dates, times, timezone: str) -> pandas.Series:
+    """
+    Converts arrays of string formatted dates and times of the same timezone to UTC timestamps,
+    with the same results of localizeDatetime
+    :param dates: an array containing the dates in the format YYYY-MM-DD
+    :param times: an array containing the times in the format HH:MM
+    :param timezone: a string containing the timezone
+    :return: a series containing the UTC timestamps, NaT for the missing or invalid strings
+    """
+    strings = pd.Series(dates, dtype=object) + " " + pd.Series(times, dtype=object)
+    naive = pd.to_datetime(strings, format=DATETIME_FORMAT, errors="coerce")
+    # repeated times in standard time as localize with is_dst=False, skipped times are left to localizeDatetime
+    localized = naive.dt.tz_localize(getTimezone(timezone), ambiguous=False, nonexistent="NaT").dt.tz_convert("UTC")
+
+    skipped = naive.notna() & localized.isna()
+    if skipped.any():
+        tz = getTimezone(timezone)
+        localized[skipped] = [tz.localize(moment.to_pydatetime(), is_dst=False).astimezone(pytz.utc)
+                              for moment in naive[skipped]]
+    return localized
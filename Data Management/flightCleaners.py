@@ -1,95 +1,232 @@
-from utils import getDatetime, getMostSimilarIATA
-
-
-def cleanFlightFromMXP(flight: dict, iatas: list) -> dict:
-    """
-    Remove unused data from the raw flight from Malpensa
-    :param flight: all the raw data from a single flight
-    :param iatas: a list containing all IATAs acronyms
-    :return: cleaned version of the flight
-    """
-    timeSplit = flight["scheduledTime"].split(" ")
-    date = timeSplit[0]
-    schedTime = timeSplit[1]
-    actualDep = None
-    if flight["actualTime"] is not None:
-        actTime = flight["actualTime"].split(" ")[1]
-        actualDep = getDatetime(date, actTime, "Europe/Rome")
-    return {
-        "number": flight["flightNumber"].replace(" ", ""),
-        "status": flight["statusPubblicDescription"],
-        "scheduledDep": getDatetime(date, schedTime, "Europe/Rome"),
-        "actualDep": actualDep,
-        "airportDep": "MXP",
-        "airportArr": getMostSimilarIATA(iatas, flight["routing"][1]["airportDescription"]),
-    }
-
-
-def cleanFlightFromBOG(flight: dict, iatas: list) -> dict:
-    """
-    Remove unused data from the raw flight from El Dorado
-    :param flight: all the raw data from a single flight
-    :param iatas: a list containing all IATAs acronyms
-    :return: cleaned version of the flight
-    """
-    date = flight["scheduleDate"].split(" ")[0]
-    schedTime = flight["scheduleDate"].split(" ")[1][:-3]
-    actTime = flight["actualDate"].split(" ")[1][:-3]
-
-    return {
-        "number": str(flight["airline"]["code"] + flight["number"]).replace(" ", ""),
-        "status": flight["status"]["en"].upper(),
-        "scheduledDep": getDatetime(date, schedTime, "America/Bogota"),
-        "actualDep": getDatetime(date, actTime, "America/Bogota"),
-        "airportDep": "BOG",
-        "airportArr": getMostSimilarIATA(iatas, flight["city"]["cityName"]),
-    }
-
-
-def cleanFlightFromRPLL(flight: dict, iatas: list) -> dict:
-    """
-    Remove unused data from the raw flight from Manila
-    :param flight: all the raw data from a single flight
-    :param iatas: a list containing all IATAs acronyms
-    :return: cleaned version of the flight
-    """
-    if flight["AtaAtd"] == "":
-        return {}
-
-    date = flight["StaStd"].split(" ")[0]
-    schedTime = flight["StaStd"].split(" ")[1][:-3]
-    actTime = flight["AtaAtd"].split(" ")[1][:-3]
-
-    return {
-        "number": flight["Airline_Code"] + flight["Flight_Number"],
-        "status": flight["Status"].upper(),
-        "scheduledDep": getDatetime(date, schedTime, "Asia/Manila"),
-        "actualDep": getDatetime(date, actTime, "Asia/Manila"),
-        "airportDep": "RPLL",
-        "airportArr": getMostSimilarIATA(iatas, flight["Destination"]),
-    }
-
-
-def cleanFlightFromATH(flight: dict, iatas: list) -> dict:
-    """
-    Remove unused data from the raw flight from Athens
-    :param flight: all the raw data from a single flight
-    :param iatas: a list containing all IATAs acronyms
-    :return: cleaned version of the flight
-    """
-    date = flight["ScheduledTime"].split(" ")[0].split("/")
-    date = date[2] + "-" + date[1] + "-" + date[0]
-    actualDep = flight["ActualTime"]
-    if actualDep == "":
-        actualDep = None
-    if actualDep is not None:
-        actualDep = getDatetime(date, actualDep, "Europe/Athens")
-    schedTime = flight["ScheduledTime"].split(" ")[1]
-    return {
-        "number": flight["FlightNo"].replace(" ", "").upper(),
-        "status": flight["FlightStateName"].upper(),
-        "scheduledDep": getDatetime(date, schedTime, "Europe/Athens"),
-        "actualDep": actualDep,
-        "airportDep": "ATH",
-        "airportArr": getMostSimilarIATA(iatas, flight["AirportName"]),
-    }
+from iataMatcher import IATAMatcher
+from utils import ampmTo24h, getDatetime
+
+
+def cleanFlightFromMXP(flight: dict, matcher: IATAMatcher) -> dict:
+    """
+    Remove unused data from the raw flight from Malpensa
+    :param flight: all the raw data from a single flight
+    :param matcher: IATAMatcher built from the list of all IATAs
+    :return: cleaned version of the flight
+    """
+    timeSplit = flight["scheduledTime"].split(" ")
+    date = timeSplit[0]
+    schedTime = timeSplit[1]
+    actualDep = None
+    if flight["actualTime"] is not None:
+        actTime = flight["actualTime"].split(" ")[1]
+        actualDep = getDatetime(date, actTime, "Europe/Rome")
+    return {
+        "number": flight["flightNumber"].replace(" ", ""),
+        "status": flight["statusPubblicDescription"],
+        "scheduledDep": getDatetime(date, schedTime, "Europe/Rome"),
+        "actualDep": actualDep,
+        "airportDep": "MXP",
+        "airportArr": matcher.getMostSimilarIATA(flight["routing"][1]["airportDescription"]),
+    }
+
+
+def cleanFlightFromBOG(flight: dict, matcher: IATAMatcher) -> dict:
+    """
+    Remove unused data from the raw flight from El Dorado
+    :param flight: all the raw data from a single flight
+    :param matcher: IATAMatcher built from the list of all IATAs
+    :return: cleaned version of the flight
+    """
+    date = flight["scheduleDate"].split(" ")[0]
+    schedTime = flight["scheduleDate"].split(" ")[1][:-3]
+    actTime = flight["actualDate"].split(" ")[1][:-3]
+
+    return {
+        "number": str(flight["airline"]["code"] + flight["number"]).replace(" ", ""),
+        "status": flight["status"]["en"].upper(),
+        "scheduledDep": getDatetime(date, schedTime, "America/Bogota"),
+        "actualDep": getDatetime(date, actTime, "America/Bogota"),
+        "airportDep": "BOG",
+        "airportArr": matcher.getMostSimilarIATA(flight["city"]["cityName"]),
+    }
+
+
+def cleanFlightFromRPLL(flight: dict, matcher: IATAMatcher) -> dict:
+    """
+    Remove unused data from the raw flight from Manila
+    :param flight: all the raw data from a single flight
+    :param matcher: IATAMatcher built from the list of all IATAs
+    :return: cleaned version of the flight
+    """
+    if flight["AtaAtd"] == "":
+        return {}
+
+    date = flight["StaStd"].split(" ")[0]
+    schedTime = flight["StaStd"].split(" ")[1][:-3]
+    actTime = flight["AtaAtd"].split(" ")[1][:-3]
+
+    return {
+        "number": flight["Airline_Code"] + flight["Flight_Number"],
+        "status": flight["Status"].upper(),
+        "scheduledDep": getDatetime(date, schedTime, "Asia/Manila"),
+        "actualDep": getDatetime(date, actTime, "Asia/Manila"),
+        "airportDep": "RPLL",
+        "airportArr": matcher.getMostSimilarIATA(flight["Destination"]),
+    }
+
+
+def cleanFlightFromATH(flight: dict, matcher: IATAMatcher) -> dict:
+    """
+    Remove unused data from the raw flight from Athens
+    :param flight: all the raw data from a single flight
+    :param matcher: IATAMatcher built from the list of all IATAs
+    :return: cleaned version of the flight
+    """
+    date = flight["ScheduledTime"].split(" ")[0].split("/")
+    date = date[2] + "-" + date[1] + "-" + date[0]
+    actualDep = flight["ActualTime"]
+    if actualDep == "":
+        actualDep = None
+    if actualDep is not None:
+        actualDep = getDatetime(date, actualDep, "Europe/Athens")
+    schedTime = flight["ScheduledTime"].split(" ")[1]
+    return {
+        "number": flight["FlightNo"].replace(" ", "").upper(),
+        "status": flight["FlightStateName"].upper(),
+        "scheduledDep": getDatetime(date, schedTime, "Europe/Athens"),
+        "actualDep": actualDep,
+        "airportDep": "ATH",
+        "airportArr": matcher.getMostSimilarIATA(flight["AirportName"]),
+    }
+
+
+def cleanFlightFromNRT(record: tuple, matcher: IATAMatcher):
+    """
+    Extract a flight from a row of the Narita departures reading its cells in a single traversal
+    :param record: a tuple containing the tr tag of the flight and the date in the format YYYY-MM-DD
+    :param matcher: IATAMatcher built from the list of all IATAs
+    :return: cleaned version of the flight, None if it is not departed or cancelled
+    """
+    flight, date = record
+    clean = {"airportDep": "NRT", "date": date}
+    schedDep = None
+    actDep = None
+    status = None
+    dest = None
+    spans = []
+    for element in flight.find_all(["td", "a", "span"]):
+        if element.name == "td":
+            classes = element.get("class", [])
+            if schedDep is None and "t002-daily__ontime" in classes:
+                schedDep = element
+            elif actDep is None and "t002-daily__updtime" in classes:
+                actDep = element
+            elif status is None and "t002-daily__status" in classes:
+                status = element
+        elif element.name == "a":
+            if dest is None:
+                dest = element
+        elif len(spans) < 2:
+            spans.append(element)
+
+    if schedDep is not None:
+        schedDep = schedDep.string
+        hour, minutes = ampmTo24h("am" in schedDep, int(schedDep.split(":")[0]), int(schedDep.split(":")[1][0:2]))
+        schedTime = str(hour) + ":" + str(minutes)
+        clean["scheduledDep"] = getDatetime(clean["date"], schedTime, "Asia/Tokyo")
+    if actDep is not None:
+        actDep = actDep.string
+        if actDep is None:
+            if "scheduledDep" in clean:
+                clean["actualDep"] = clean["scheduledDep"]
+        else:
+            actDep = actDep[1:-1]
+            hour, minutes = ampmTo24h("am" in actDep, int(actDep.split(":")[0]), int(actDep.split(":")[1][0:2]))
+            actTime = str(hour) + ":" + str(minutes)
+            clean["actualDep"] = getDatetime(clean["date"], actTime, "Asia/Tokyo")
+    if dest is not None:
+        dest = dest.string
+        if dest is not None:
+            airportName = dest.replace(" ", "").replace("\n", "").replace("\t", "").replace("\r", "")
+            clean["airportArr"] = matcher.getMostSimilarIATA(airportName)
+    if status is not None:
+        clean["status"] = status.string
+    if len(spans) > 1:
+        clean["number"] = str(spans[1].string).replace(" ", "")
+    if len(clean) == 6 and clean["status"] is not None and (
+            clean["status"].lower() == "departed" or clean["status"].lower() == "cancelled"):
+        return clean
+    return None
+
+
+def cleanFlightFromRKV(record: tuple, matcher: IATAMatcher):
+    """
+    Extract a flight from a row of the Reykjavík departures
+    :param record: a tuple containing the tr tag of the flight and the date in the format YYYY-MM-DD
+    :param matcher: IATAMatcher built from the list of all IATAs
+    :return: cleaned version of the flight, None if it is not departed or cancelled
+    """
+    flight, date = record
+    clean = {"airportDep": "RKV", "date": date}
+    cutoff = flight.find_all("span", {"class": "cutoff"})
+    tds = flight.find_all("td")
+    if len(tds) == 6:
+        schedTime = tds[0].string
+        clean["scheduledDep"] = getDatetime(clean["date"], schedTime, "Atlantic/Reykjavik")
+        clean["number"] = tds[2].string.replace(" ", "").replace("\n", "").replace("\t", "").replace("\r", "")
+    if len(cutoff) == 3:
+        clean["airportArr"] = matcher.getMostSimilarIATA(cutoff[0].string.upper())
+        actDep = cutoff[2].string
+        if "departed" in actDep.lower():
+            actTime = actDep.split(" ")[1]
+            clean["actualDep"] = getDatetime(clean["date"], actTime, "Atlantic/Reykjavik")
+            clean["status"] = "DEPARTED"
+        elif "cancelled" in actDep.lower():
+            clean["actualDep"] = None
+            clean["status"] = "CANCELLED"
+    return keepDepartedOrCancelled(clean)
+
+
+def cleanFlightFromMIA(flight, matcher: IATAMatcher):
+    """
+    Extract a flight from a row of the Miami departures
+    :param flight: the tr tag of the flight
+    :param matcher: IATAMatcher built from the list of all IATAs
+    :return: cleaned version of the flight, None if it is not departed or cancelled
+    """
+    clean = {"airportDep": "MIA"}
+    tds = flight.find_all("td")
+    number = tds[0].get("id")
+    splitted = number.split(" ")
+    if len(splitted) > 1:
+        number = str(splitted[0][0]) + str(splitted[1][0])
+    else:
+        number = splitted[0][0:2].upper()
+    number += tds[1].get("id")
+    clean["number"] = number.replace(" ", "")
+    clean["airportArr"] = matcher.getMostSimilarIATA(tds[2].get("id"))
+    date = tds[3].string.split("\xa0")[1]
+    date = f"20{date.split('-')[2]}-{date.split('-')[0]}-{date.split('-')[1]}"
+    clean["date"] = date
+    hour = int(tds[3].string.split("\xa0")[0].split(":")[0].replace(" ", ""))
+    minutes = int(tds[3].string.split("\xa0")[0].split(":")[1][:-1])
+    am = tds[3].string.split("\xa0")[0].split(":")[1][-1] == "A"
+    hour, minutes = ampmTo24h(am, hour, minutes)
+    schedTime = str(hour) + ":" + str(minutes)
+    clean["scheduledDep"] = getDatetime(clean["date"], schedTime, "America/New_York")
+    status = tds[4].font.string.replace("\t", "").replace("\n", "").replace("\r", "")[1:-1].split(" ")
+    clean["status"] = status[0].upper()
+    if "departed" in clean["status"].lower():
+        hour, minutes = ampmTo24h("A" in status[1], int(status[1].split(":")[0]), int(status[1].split(":")[1][0:2]))
+        actTime = str(hour) + ":" + str(minutes)
+        clean["actualDep"] = getDatetime(clean["date"], actTime, "America/New_York")
+    elif "cancelled" in clean["status"].lower():
+        clean["actualDep"] = None
+    return keepDepartedOrCancelled(clean)
+
+
+def keepDepartedOrCancelled(flight: dict):
+    """
+    Filter out the flights not departed or cancelled yet
+    :param flight: cleaned version of the flight
+    :return: the flight if departed or cancelled, None otherwise
+    """
+    if "status" in flight and ("departed" in flight["status"].lower() or "cancelled" in flight["status"].lower()):
+        return flight
+    return None
@@ -0,0 +1,173 @@
+import json
+import os
+import shutil
+from datetime import datetime, timedelta, timezone
+
+import pandas
+import pandas as pd
+from bson import ObjectId
+
+from meteo import WEATHER_RETRY_DAYS
+from storage import FlightStorage
+from utils import ANALYSIS_FIELDS, DATETIME_FIELDS, FLOAT_FIELDS, createDelaysColumn
+
+SNAPSHOT_PATH = "snapshot"
+SNAPSHOT_VERSION = 1
+# flights inserted this long before the watermark are read again at each refresh, a concurrent writer
+# can commit a flight with a lower _id after a higher one was exported
+SNAPSHOT_LAG = timedelta(minutes=10)
+# parts written before the snapshot is compacted, each refresh writes at least one part for each batch
+COMPACT_PARTS = 200
+
+SNAPSHOT_FIELDS = ANALYSIS_FIELDS + ["number", "status"]
+
+
+def readState(path: str) -> dict:
+    """
+    Read the state of the snapshot
+    :param path: a string containing the directory of the snapshot
+    :return: a dict containing the last exported _id, the _ids exported while waiting for the weather
+    and the number of parts written
+    """
+    statePath = os.path.join(path, "_state.json")
+    if not os.path.exists(statePath):
+        return {"version": SNAPSHOT_VERSION, "watermark": None, "pending": [], "parts": 0}
+    f = open(statePath, "r", encoding="utf8")
+    state = json.loads(f.read())
+    f.close()
+    return state
+
+
+def writeState(path: str, state: dict) -> None:
+    """
+    Write the state of the snapshot
+    :param path: a string containing the directory of the snapshot
+    :param state: a dict containing the state
+    :return: None
+    """
+    f = open(os.path.join(path, "_state.json"), "w", encoding="utf8")
+    f.write(json.dumps(state, indent=4))
+    f.close()
+
+
+def batchToDataframe(batch: list, part: int) -> pandas.DataFrame:
+    """
+    Convert a batch of flights to a typed dataframe ready to be written in the snapshot
+    :param batch: a list of flights
+    :param part: number of the part, rows of later parts replace the ones with the same _id
+    :return: a dataframe containing the flights
+    """
+    dataframe = pd.DataFrame({"_id": [str(flight["_id"]) for flight in batch]})
+    for field in SNAPSHOT_FIELDS:
+        values = [flight.get(field) for flight in batch]
+        if field in DATETIME_FIELDS:
+            dataframe[field] = pd.to_datetime(values, utc=True, errors="coerce")
+        elif field in FLOAT_FIELDS:
+            dataframe[field] = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce")
+        else:
+            dataframe[field] = pd.Series(values, dtype=object).astype("string")
+    dataframe["airportDep"] = dataframe["airportDep"].fillna("unknown")
+    dataframe["month"] = dataframe["scheduledDep"].dt.strftime("%Y-%m").fillna("unknown")
+    dataframe["part"] = part
+    return dataframe
+
+
+def refreshSnapshot(conn: FlightStorage, path=SNAPSHOT_PATH, batchSize=50000, compactParts=COMPACT_PARTS,
+                    lag=SNAPSHOT_LAG, retryDays=WEATHER_RETRY_DAYS) -> int:
+    """
+    Export to the local snapshot the flights inserted after the last refresh
+    and the flights that received the weather after being exported,
+    the snapshot is partitioned by departure airport and month and compacted when it has too many parts,
+    the flights exported again replace the previous version when the snapshot is read
+    :param conn: connection object
+    :param path: a string containing the directory of the snapshot
+    :param batchSize: number of flights written in each part
+    :param compactParts: number of parts from which the snapshot is compacted, None to never compact it
+    :param lag: a timedelta, the flights inserted this long before the last exported one are read again
+    :param retryDays: number of days a flight waiting for the weather is followed, after that it is
+    not exported again
+    :return: the number of flights exported
+    """
+    os.makedirs(path, exist_ok=True)
+    state = readState(path)
+
+    queries = []
+    if state["watermark"] is None:
+        queries.append({})
+    else:
+        since = ObjectId(state["watermark"]).generation_time - lag
+        queries.append({"_id": {"$gt": ObjectId.from_datetime(since)}})
+    if len(state["pending"]) > 0:
+        queries.append({"_id": {"$in": [ObjectId(objId) for objId in state["pending"]]},
+                        "weatherPending": {"$exists": False}})
+
+    pending = set(state["pending"])
+    exported = 0
+    for query in queries:
+        for batch in conn.iterFlights(batchSize, SNAPSHOT_FIELDS + ["weatherPending"], query):
+            state["parts"] += 1
+            dataframe = batchToDataframe(batch, state["parts"])
+            dataframe.to_parquet(path, partition_cols=["airportDep", "month"], index=False,
+                                 basename_template=f"part-{state['parts']:06d}-{{i}}.parquet")
+            for flight in batch:
+                objId = str(flight["_id"])
+                if "weatherPending" in flight:
+                    pending.add(objId)
+                else:
+                    pending.discard(objId)
+                if state["watermark"] is None or ObjectId(objId) > ObjectId(state["watermark"]):
+                    state["watermark"] = objId
+            exported += len(batch)
+
+    # flights still pending out of the retry window of the enrichment will not receive the weather anymore
+    oldest = ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(retryDays))
+    state["pending"] = sorted(objId for objId in pending if ObjectId(objId) >= oldest)
+    writeState(path, state)
+    if compactParts is not None and state["parts"] >= compactParts:
+        compactSnapshot(path)
+    return exported
+
+
+def readSnapshot(path=SNAPSHOT_PATH) -> pandas.DataFrame:
+    """
+    Read all the flights in the snapshot keeping the last exported version of each flight
+    :param path: a string containing the directory of the snapshot
+    :return: a dataframe containing the flights
+    """
+    dataframe = pd.read_parquet(path)
+    dataframe["airportDep"] = dataframe["airportDep"].astype("string")
+    dataframe = dataframe.sort_values("part", kind="stable").drop_duplicates("_id", keep="last")
+    return dataframe.drop(columns=["month", "part"])
+
+
+def loadSnapshot(path=SNAPSHOT_PATH) -> pandas.DataFrame:
+    """
+    Build the analysis dataframe from the snapshot
+    :param path: a string containing the directory of the snapshot
+    :return: a dataframe with the same columns of flightsCursorToDataframe
+    """
+    dataframe = readSnapshot(path)
+    dataframe = dataframe[["_id"] + ANALYSIS_FIELDS].reset_index(drop=True)
+    dataframe.index = dataframe["_id"]
+    return createDelaysColumn(dataframe)
+
+
+def compactSnapshot(path=SNAPSHOT_PATH) -> None:
+    """
+    Rewrite the snapshot with a single version of each flight
+    :param path: a string containing the directory of the snapshot
+    :return: None
+    """
+    state = readState(path)
+    dataframe = readSnapshot(path)
+    dataframe["month"] = dataframe["scheduledDep"].dt.strftime("%Y-%m").fillna("unknown")
+    dataframe["part"] = 1
+
+    compacted = path + ".compact"
+    shutil.rmtree(compacted, ignore_errors=True)
+    dataframe.to_parquet(compacted, partition_cols=["airportDep", "month"], index=False,
+                         basename_template="part-000001-{i}.parquet")
+    state["parts"] = 1
+    writeState(compacted, state)
+    shutil.rmtree(path)
+    os.rename(compacted, path)
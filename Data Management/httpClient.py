@@ -0,0 +1,94 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# seconds to wait for the connection and for the response respectively
+DEFAULT_TIMEOUT = (5, 30)
+
+# minimum number of seconds between two requests to the same host
+HOST_RATE_LIMITS = {
+    "archive-api.open-meteo.com": 0.2,
+    "photon.komoot.io": 1.0,
+}
+
+session = None
+sessionLock = threading.Lock()
+lastRequest = {}
+rateLock = threading.Lock()
+
+
+def createRetry(retries=4, backoffFactor=0.5) -> Retry:
+    """
+    Create the retry policy of the requests
+    :param retries: maximum number of retries of a request
+    :param backoffFactor: factor of the exponential backoff between retries
+    :return: a Retry object
+    """
+    return Retry(
+        total=retries,
+        backoff_factor=backoffFactor,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def createSession(retries=4, backoffFactor=0.5, poolSize=10) -> requests.Session:
+    """
+    Create a session keeping the connections alive and retrying failed requests
+    :param retries: maximum number of retries of a request
+    :param backoffFactor: factor of the exponential backoff between retries
+    :param poolSize: maximum number of connections kept alive for each host
+    :return: a Session object
+    """
+    adapter = HTTPAdapter(pool_connections=20, pool_maxsize=poolSize, max_retries=createRetry(retries, backoffFactor))
+    newSession = requests.Session()
+    newSession.mount("https://", adapter)
+    newSession.mount("http://", adapter)
+    return newSession
+
+
+def getSession() -> requests.Session:
+    """
+    Returns the session shared by every request, creating it the first time
+    :return: a Session object
+    """
+    global session
+    with sessionLock:
+        if session is None:
+            session = createSession()
+        return session
+
+
+def waitRateLimit(host: str) -> None:
+    """
+    Wait until a new request to the host respects its rate limit
+    :param host: a string containing the host to contact
+    :return: None
+    """
+    interval = HOST_RATE_LIMITS.get(host)
+    if interval is None:
+        return
+    with rateLock:
+        now = time.monotonic()
+        nextSlot = max(now, lastRequest.get(host, 0) + interval)
+        lastRequest[host] = nextSlot
+    if nextSlot > now:
+        time.sleep(nextSlot - now)
+
+
+def httpGet(url: str, headers=None, timeout=DEFAULT_TIMEOUT) -> requests.Response:
+    """
+    Make a GET request using the shared session
+    :param url: a string containing the url to request
+    :param headers: a dict containing the headers of the request
+    :param timeout: a tuple containing connect and read timeout in seconds
+    :return: a Response object
+    """
+    waitRateLimit(urlparse(url).hostname)
+    return getSession().get(url, headers=headers, timeout=timeout)
@@ -0,0 +1,231 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from httpClient import createRetry, getSession
+
+# the fixtures pinned in the repository, replayed by default
+FIXTURES_PATH = "fixtures"
+# the new recordings are kept apart from the pinned fixtures until they are copied there
+RECORDINGS_PATH = os.path.join(FIXTURES_PATH, "recordings")
+FIXTURES_VERSION = 1
+# IATA reference pinned with the fixtures, the replayed runs do not need the pdf
+FIXTURES_IATA_PATH = os.path.join(FIXTURES_PATH, f"v{FIXTURES_VERSION}", "iata.json")
+
+# storage used by the replayed runs, so that the replayed flights are thrown away at the end
+REPLAY_STORAGE_URI = "sqlite:///:memory:"
+
+# dates change at every run, the fixtures are matched on the rest of the url
+DATE_PATTERN = re.compile(r"\d{4}-?\d{2}-?\d{2}")
+
+fixturesLock = threading.Lock()
+
+
+def fixtureKey(url: str) -> str:
+    """
+    Build the key of the fixture of a request
+    :param url: a string containing the url requested
+    :return: a string containing the url with the dates masked
+    """
+    return DATE_PATTERN.sub("DATE", url)
+
+
+def fixturePath(path: str, url: str) -> str:
+    """
+    Build the path of the file containing the fixtures of a request
+    :param path: a string containing the directory of the fixtures
+    :param url: a string containing the url requested
+    :return: a string containing the path of the fixtures
+    """
+    name = hashlib.sha1(fixtureKey(url).encode("utf8")).hexdigest()[:16]
+    return os.path.join(path, f"v{FIXTURES_VERSION}", urlparse(url).hostname, name + ".json.gz")
+
+
+def loadFixtureFile(filePath: str) -> dict:
+    """
+    Read a file of fixtures
+    :param filePath: a string containing the path of the file
+    :return: a dict containing the key, the responses recorded for each url and the last url recorded
+    """
+    if not os.path.exists(filePath):
+        return {"key": None, "responses": {}, "latest": None}
+    f = gzip.open(filePath, "rt", encoding="utf8")
+    fixtures = json.loads(f.read())
+    f.close()
+    return fixtures
+
+
+def writeFixture(path: str, response: requests.Response) -> None:
+    """
+    Save a response as a compressed json fixture, the responses of urls differing only by the dates
+    are kept in the same file
+    :param path: a string containing the directory of the fixtures
+    :param response: the Response object to save
+    :return: None
+    """
+    url = response.request.url
+    filePath = fixturePath(path, url)
+    recorded = {
+        "status": response.status_code,
+        "contentType": response.headers.get("Content-Type"),
+        "recordedAt": datetime.now().isoformat(timespec="seconds"),
+        "body": response.content.decode(response.encoding or "utf-8", errors="replace"),
+    }
+    with fixturesLock:
+        os.makedirs(os.path.dirname(filePath), exist_ok=True)
+        fixtures = loadFixtureFile(filePath)
+        fixtures["key"] = fixtureKey(url)
+        fixtures["latest"] = url
+        fixtures["responses"][url] = recorded
+        f = gzip.open(filePath, "wt", encoding="utf8")
+        f.write(json.dumps(fixtures, ensure_ascii=False))
+        f.close()
+
+
+def readFixture(path: str, url: str):
+    """
+    Read the fixture of a request, the response of the same url if recorded,
+    otherwise the last one recorded for a url differing only by the dates
+    :param path: a string containing the directory of the fixtures
+    :param url: a string containing the url requested
+    :return: a dict containing the fixture, None if not recorded
+    """
+    fixtures = loadFixtureFile(fixturePath(path, url))
+    if url in fixtures["responses"]:
+        return fixtures["responses"][url]
+    if fixtures["latest"] is not None:
+        return fixtures["responses"][fixtures["latest"]]
+    return None
+
+
+def scaleJson(document, factor: int):
+    """
+    Make a json response bigger repeating its longest list of records
+    :param document: the decoded json response
+    :param factor: number of times the records are repeated
+    :return: the json response scaled
+    """
+    longest = None
+    stack = [document]
+    while len(stack) > 0:
+        node = stack.pop()
+        children = node.values() if isinstance(node, dict) else node if isinstance(node, list) else []
+        if isinstance(node, list) and (longest is None or len(node) > len(longest)):
+            longest = node
+        stack += [child for child in children if isinstance(child, (dict, list))]
+    if longest is not None:
+        longest[:] = longest * factor
+    return document
+
+
+def scaleHtml(body: str, factor: int) -> str:
+    """
+    Make an html response bigger repeating the rows of its tables
+    :param body: a string containing the html response
+    :param factor: number of times the rows are repeated
+    :return: a string containing the html response scaled
+    """
+    start = body.find("<tr")
+    end = body.rfind("</tr>")
+    if start < 0 or end < 0:
+        return body
+    end += len("</tr>")
+    return body[:start] + body[start:end] * factor + body[end:]
+
+
+def scaleBody(fixture: dict, factor: int) -> str:
+    """
+    Scale the body of a fixture to simulate an airport with more flights
+    :param fixture: a dict containing the fixture
+    :param factor: number of times the records are repeated
+    :return: a string containing the body scaled
+    """
+    if factor == 1:
+        return fixture["body"]
+    if "json" in (fixture["contentType"] or ""):
+        return json.dumps(scaleJson(json.loads(fixture["body"]), factor))
+    return scaleHtml(fixture["body"], factor)
+
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    Transport adapter making the real requests and saving each response as a fixture
+    """
+
+    def __init__(self, path=FIXTURES_PATH, **kwargs):
+        """
+        :param path: a string containing the directory of the fixtures
+        :param kwargs: the parameters of HTTPAdapter
+        """
+        super().__init__(**kwargs)
+        self.path = path
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        if response.status_code == 200:
+            writeFixture(self.path, response)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Transport adapter answering the requests with the recorded fixtures without using the network,
+    the responses can be scaled up to simulate bigger airports
+    """
+
+    def __init__(self, path=FIXTURES_PATH, scale=1):
+        """
+        :param path: a string containing the directory of the fixtures
+        :param scale: number of times the records of each response are repeated
+        """
+        super().__init__()
+        self.path = path
+        self.scale = scale
+
+    def send(self, request, **kwargs):
+        fixture = readFixture(self.path, request.url)
+        if fixture is None:
+            raise requests.ConnectionError(f"No fixture recorded for {request.url}", request=request)
+        response = requests.Response()
+        response.status_code = fixture["status"]
+        response.headers = CaseInsensitiveDict({"Content-Type": fixture["contentType"] or "text/html"})
+        response.encoding = "utf-8"
+        response._content = scaleBody(fixture, self.scale).encode("utf-8")
+        response.url = request.url
+        response.request = request
+        response.reason = "OK" if fixture["status"] == 200 else "Replayed"
+        return response
+
+    def close(self):
+        pass
+
+
+def useFixtures(mode: str, path=None, scale=1) -> None:
+    """
+    Mount the record or replay adapter on the session shared by every request
+    :param mode: a string, record to save the real responses, replay to answer from the saved ones
+    :param path: a string containing the directory of the fixtures, None to record in RECORDINGS_PATH
+    and to replay from FIXTURES_PATH
+    :param scale: number of times the records of each replayed response are repeated
+    :return: None
+    """
+    if path is None:
+        path = RECORDINGS_PATH if mode == "record" else FIXTURES_PATH
+    session = getSession()
+    if mode == "record":
+        adapter = RecordingAdapter(path, pool_connections=20, pool_maxsize=10, max_retries=createRetry())
+    elif mode == "replay":
+        adapter = ReplayAdapter(path, scale)
+    else:
+        raise ValueError(f"Unknown fixtures mode {mode}")
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
@@ -0,0 +1,135 @@
+from collections import deque
+from functools import lru_cache
+
+
+def normalizeIATAName(name: str) -> str:
+    """
+    Normalize the name of an airport in the IATA list the same way getMostSimilarIATA does
+    :param name: a string containing the name of the airport in the IATA list
+    :return: a string containing the normalized name
+    """
+    return name.split(",")[0].lower().replace(" ", "")
+
+
+class IATAMatcher:
+    """
+    Find the IATA of an airport name searching all the IATA names at once with an Aho-Corasick automaton,
+    the result is the same acronym returned by getMostSimilarIATA: the first IATA in the list
+    whose name is contained in the airport name
+    """
+
+    def __init__(self, iatas: list, cacheSize=4096):
+        """
+        Build the automaton from the IATA list
+        :param iatas: a list containing the IATAs as dict with acronym and name
+        :param cacheSize: maximum number of airport names whose IATA is kept in memory
+        """
+        self.acronyms = [iata["acronym"] for iata in iatas]
+        # position in the list of the first IATA having the name, it decides which IATA wins
+        ranks = {}
+        for rank, iata in enumerate(iatas):
+            name = normalizeIATAName(iata["name"])
+            if name not in ranks:
+                ranks[name] = rank
+
+        # an empty name is contained in every airport name
+        self.emptyRank = ranks.pop("", None)
+
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [None]
+        for name, rank in ranks.items():
+            self.addPattern(name, rank)
+        self.buildFailLinks()
+
+        self.exactNames = {}
+        for name in ranks:
+            self.exactNames[name] = self.search(name)
+
+        self.cachedResolve = lru_cache(maxsize=cacheSize)(self.resolve)
+
+    def addPattern(self, pattern: str, rank: int) -> None:
+        """
+        Add a name to the trie of the automaton
+        :param pattern: a string containing the normalized name
+        :param rank: position of the IATA in the list
+        :return: None
+        """
+        node = 0
+        for char in pattern:
+            if char not in self.goto[node]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.best.append(None)
+                self.goto[node][char] = len(self.goto) - 1
+            node = self.goto[node][char]
+        if self.best[node] is None or rank < self.best[node]:
+            self.best[node] = rank
+
+    def buildFailLinks(self) -> None:
+        """
+        Compute the failure links and propagate the best rank of the names ending in each node
+        :return: None
+        """
+        queue = deque(self.goto[0].values())
+        while len(queue) > 0:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                state = self.fail[node]
+                while state != 0 and char not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(char, 0)
+                self.best[child] = minRank(self.best[child], self.best[self.fail[child]])
+                queue.append(child)
+
+    def search(self, text: str):
+        """
+        Find the best rank among the names contained in the text
+        :param text: a string containing the normalized airport name
+        :return: the position of the first IATA whose name is in the text, None if not found
+        """
+        best = self.emptyRank
+        node = 0
+        for char in text:
+            while node != 0 and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            best = minRank(best, self.best[node])
+        return best
+
+    def resolve(self, airportName: str) -> str:
+        """
+        Find the IATA based on airport name without using the cache
+        :param airportName: a string containing the name to search
+        :return: a string containing converted name
+        """
+        airportName = airportName.lower().replace(" ", "")
+        if airportName in self.exactNames:
+            rank = self.exactNames[airportName]
+        else:
+            rank = self.search(airportName)
+        if rank is None:
+            return airportName.upper()
+        return self.acronyms[rank]
+
+    def getMostSimilarIATA(self, airportName: str) -> str:
+        """
+        Find the IATA based on airport name, if not found just returns the name provided as parameter
+        :param airportName: a string containing the name to search
+        :return: a string containing converted name
+        """
+        return self.cachedResolve(airportName)
+
+
+def minRank(left, right):
+    """
+    Returns the lowest of two ranks ignoring the missing ones
+    :param left: a rank or None
+    :param right: a rank or None
+    :return: the lowest rank, None if both are missing
+    """
+    if left is None:
+        return right
+    if right is None:
+        return left
+    return min(left, right)
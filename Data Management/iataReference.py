@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+
+from storage import FlightStorage
+
+IATA_PDF_PATH = "IATA.pdf"
+IATA_ARTIFACT_PATH = "iata.json"
+IATA_ARTIFACT_VERSION = 1
+
+
+def fileHash(path: str) -> str:
+    """
+    Compute the hash of a file reading it in chunks
+    :param path: a string containing the path of the file
+    :return: a string containing the sha256 of the file
+    """
+    digest = hashlib.sha256()
+    file = open(path, "rb")
+    for chunk in iter(lambda: file.read(1 << 20), b""):
+        digest.update(chunk)
+    file.close()
+    return digest.hexdigest()
+
+
+def readIATApdf(path=IATA_PDF_PATH) -> list:
+    """
+    Read the pdf containing the IATA acronyms
+    :param path: a string containing the path of the pdf
+    :return: A list containing all the IATAs in the pdf file as dict
+    """
+    # only needed when the artifact has to be built
+    import PyPDF2
+
+    file = open(path, "rb")
+    reader = PyPDF2.PdfReader(file)
+    airports = []
+    for page in range(len(reader.pages)):
+        pageObj = reader.pages[page]
+        airports += pageObj.extract_text().split("\n")
+    file.close()
+    # rimozione primo e ultimo elemento
+    airports = airports[1: -1]
+    iatas = []
+    for airport in airports:
+        splitted = airport.split(" – ")
+        acronym = splitted[0].replace(" ", "")
+        name = ""
+        for el in splitted[1:]:
+            name += el + " "
+        name = name.replace(" ", "").replace(",", ", ")
+        if name != "" and acronym != "":
+            iatas.append({"acronym": acronym, "name": name})
+    return iatas
+
+
+def readArtifact(path: str):
+    """
+    Read the IATAs parsed from the pdf
+    :param path: a string containing the path of the artifact
+    :return: a dict containing version, hash of the pdf and IATAs, None if missing or unreadable
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        f = open(path, "r", encoding="utf8")
+        artifact = json.loads(f.read())
+        f.close()
+    except ValueError:
+        return None
+    if artifact.get("version") != IATA_ARTIFACT_VERSION:
+        return None
+    return artifact
+
+
+def writeArtifact(path: str, digest: str, iatas: list) -> None:
+    """
+    Write the IATAs parsed from the pdf, only acronym and name are kept
+    :param path: a string containing the path of the artifact
+    :param digest: a string containing the hash of the pdf
+    :param iatas: a list containing the IATAs as dict
+    :return: None
+    """
+    artifact = {"version": IATA_ARTIFACT_VERSION, "hash": digest,
+                "iatas": [[iata["acronym"], iata["name"]] for iata in iatas]}
+    temporary = path + ".tmp"
+    f = open(temporary, "w", encoding="utf8")
+    f.write(json.dumps(artifact, ensure_ascii=False, separators=(",", ":")))
+    f.close()
+    os.replace(temporary, path)
+
+
+def loadIATAReference(pdfPath=IATA_PDF_PATH, artifactPath=IATA_ARTIFACT_PATH) -> (list, str):
+    """
+    Load the IATAs from the artifact, the pdf is parsed again only when it changed since the artifact was written
+    :param pdfPath: a string containing the path of the pdf, None to read only the artifact
+    :param artifactPath: a string containing the path of the artifact
+    :return: a list containing the IATAs as dict and a string containing the hash of the pdf they come from
+    """
+    artifact = readArtifact(artifactPath)
+    if pdfPath is not None and os.path.exists(pdfPath):
+        digest = fileHash(pdfPath)
+        if artifact is None or artifact["hash"] != digest:
+            iatas = readIATApdf(pdfPath)
+            writeArtifact(artifactPath, digest, iatas)
+            print(f"[+] Caricati {len(iatas)} IATA dal pdf")
+            return iatas, digest
+    elif artifact is None:
+        raise FileNotFoundError(f"Neither {pdfPath} nor {artifactPath} found")
+    return [{"acronym": acronym, "name": name} for acronym, name in artifact["iatas"]], artifact["hash"]
+
+
+def syncIATA(conn: FlightStorage, iatas: list, digest: str) -> None:
+    """
+    Insert the IATAs in the dedicated collection with a single bulk upsert,
+    nothing is sent if the collection was already synced with the same pdf
+    :param conn: connection object
+    :param iatas: a list containing the IATAs as dict
+    :param digest: a string containing the hash of the pdf the IATAs come from
+    :return: None
+    """
+    if conn.getMeta("iataReference").get("hash") == digest:
+        return
+    counts = conn.bulkUpsertIATA(iatas)
+    print(f"[+] Caricati {counts['inserted']} IATA, già presenti {counts['matched']}, falliti {counts['failed']}")
+    if counts["failed"] == 0:
+        conn.setMeta("iataReference", {"hash": digest, "count": len(iatas)})
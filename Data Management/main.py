@@ -1,347 +1,455 @@
-from typing import Callable
-
-import pandas
-import requests
-from datetime import datetime
-
-import PyPDF2
-
-from DBConnection import DBConnection
-from flightScrapers import getMPXFlights, getNRTFlights, getRKVFlights, getBOGFlights, getMIAFlights, getRPLLFlights, \
-    getATHFlights
-from utils import delaysCorrelations, printMeasures, flightsListToDataframe, splitDatetime, reportToCsv
-
-
-def getAndInsertFlights(conn: DBConnection, isServer: bool, iatas) -> None:
-    """
-    Get all the flights from each airport and load them in MongoDB
-    :param conn: connection object
-    :param isServer: boolean that track if the code is running on the server or not
-    :return: None
-    """
-
-    flights = []
-
-    # flights of Malpensa
-    print("Malpensa..")
-    flights += getMPXFlights(iatas)
-    # flights of Narita
-    print("Narita..")
-    flights += getNRTFlights(iatas)
-    # Reykjavik flights
-    print("Rejkyavik..")
-    flights += getRKVFlights(iatas)
-    # El Dorado flights
-    print("Bogotà..")
-    flights += getBOGFlights(iatas)
-    # Miami flights
-    print("Miami..")
-    flights += getMIAFlights(iatas)
-    # Manila flights
-    print("Manila..")
-    flights += getRPLLFlights(iatas)
-    # Atene flights
-    print("Atene..")
-    flights += getATHFlights(iatas)
-
-    print("\nAdding flights...")
-    for flight in flights:
-        conn.insertOneFlight(flight)
-    print("Added all flights!\n")
-
-    if isServer:
-        f = open("added.out", "a")
-        f.write(f"{datetime.now().strftime('%m/%d/%Y, %H:%M:%S')} -> {len(flights)}\n")
-        f.close()
-
-
-def getAirportsCoordinates(flights: list) -> dict:
-    """
-    Get latitude and longitude for each airport using a dedicated API
-    :param flights: list of all the flights
-    :return: A dict having the name of the airport as a key and latitude and longitude as value
-    """
-    # getAirportsCoordinates -> function to obtain latitude and longitude from API for each airport
-    airports = {}
-
-    for flight in flights:
-        if flight["airportDep"] not in airports:
-            airport = flight["airportDep"].replace(" ", "%20")
-            res = requests.get(f"https://photon.komoot.io/api/?lang=en&limit=5&q={airport}")
-            res = res.json()
-            latitude = res["features"][0]["geometry"]["coordinates"][1]
-            longitude = res["features"][0]["geometry"]["coordinates"][0]
-            airports[flight["airportDep"]] = {"latitude": latitude, "longitude": longitude}
-    return airports
-
-
-def dayForEachAirport(airports: dict, flights: list) -> dict:
-    """
-    Function that create a new dict based on the one with latitude and longitude,
-    in which are stored all the meteo information as a list
-    :param airports:
-    :param flights:
-    :return: A dict having the name of the airport as a key and a dict as value,
-    the inner dict has the date as key and the meteo information as a value
-    """
-    airportsNew = {}
-    for flight in flights:
-        if flight["airportDep"] not in airportsNew:
-            airportsNew[flight["airportDep"]] = {}
-        date, schedDep = splitDatetime(flight["scheduledDep"])
-        if date not in airportsNew[flight["airportDep"]]:
-            airportsNew[flight["airportDep"]][date] = {}
-
-    for airportName, dates in airportsNew.items():
-        for date in dates:
-            res = requests.get(
-                f"https://archive-api.open-meteo.com/v1/archive?latitude={airports[airportName]['latitude']}&longitude={airports[airportName]['longitude']}&start_date={date}&end_date={date}&hourly=precipitation,cloud_cover,wind_speed_10m,wind_speed_100m&timezone=GMT")
-            airportsNew[airportName][date] = res.json()
-
-    return airportsNew
-
-
-def addMeteoToFlights(conn: DBConnection, flights: list) -> None:
-    """
-    Add weather conditions for flight in the database
-    :param conn: connection object
-    :param flights: list of all the flights
-    :return: None
-    """
-
-    airports = getAirportsCoordinates(flights)
-    airports = dayForEachAirport(airports, flights)
-
-    for flight in flights:
-        stats = ["precipitation", "cloud_cover", "wind_speed_10m", "wind_speed_100m"]
-        found = 0
-
-        for statName in stats:
-            if statName in flight:
-                found += 1
-
-        if found != len(stats):
-            airport = flight["airportDep"]
-            date, schedDep = splitDatetime(flight["scheduledDep"])
-            hour = schedDep.split(":")[0] + ":00"
-            percentageHour = int(schedDep.split(":")[1]) / 60
-
-            statsObj = airports[airport][date]
-
-            index = -1
-            for i, time in enumerate(statsObj["hourly"]["time"]):
-                if hour in time:
-                    index = i
-
-            for stat in stats:
-                if index < len(statsObj["hourly"][stat]) - 1:
-                    left = statsObj["hourly"][stat][index]
-                    right = statsObj["hourly"][stat][index + 1]
-                    if left is not None and right is not None:
-                        value = round(left * (1 - percentageHour) + right * percentageHour, 4)
-                        flight[stat] = value
-                elif statsObj["hourly"][stat][index] is not None:
-                    flight[stat] = statsObj["hourly"][stat][index]
-
-            conn.updateFlight(flight)
-
-
-def readIATApdf() -> list:
-    """
-    Read the pdf containing the IATA acronyms
-    :return: A list containing all the IATAs in the pdf file as dict
-    """
-    file = open("IATA.pdf", "rb")
-    reader = PyPDF2.PdfReader(file)
-    airports = []
-    for page in range(len(reader.pages)):
-        pageObj = reader.pages[page]
-        airports += pageObj.extract_text().split("\n")
-    file.close()
-    # rimozione primo e ultimo elemento
-    airports = airports[1: -1]
-    iatas = []
-    for airport in airports:
-        splitted = airport.split(" – ")
-        acronym = splitted[0].replace(" ", "")
-        name = ""
-        for el in splitted[1:]:
-            name += el + " "
-        name = name.replace(" ", "").replace(",", ", ")
-        if name != "" and acronym != "":
-            iatas.append({"acronym": acronym, "name": name})
-    return iatas
-
-
-def insertIATA(conn, iatas) -> None:
-    """
-    Insert all IATAs in the dedicated collection
-    :param conn: connection object
-    :param iatas: list of IATA objects to insert
-    :return: None
-    """
-    for iata in iatas:
-        conn.insertOneIATA(iata)
-
-
-def handleQuery(queryFunction: Callable, airportNames: list, report: dict, key: str) -> dict:
-    """
-    Execute the query passed as function and return the prettified response in a dict
-    :param queryFunction: query to execute
-    :param airportNames: a list of airport names in the database
-    :param report: a dict containing the previous query responses
-    :param key: a string explaining the query
-    :return: A dict containing the actual query response
-    """
-    toPrint = {}
-    response = queryFunction()
-    for el in response:
-        keys = list(el.keys())
-        keys.remove("airport")
-        value = el[keys[0]]
-        if value is not None:
-            value = round(value, 3)
-        toPrint[el["airport"]] = value
-    remaining = list(set(airportNames) - set(toPrint.keys()))
-    for el in remaining:
-        toPrint[el] = 0
-    for el in toPrint:
-        print(el + ": " + str(toPrint[el]))
-    report[key] = toPrint
-    return report
-
-
-def dataQuality(dfFlights: pandas.DataFrame, iatas: list) -> dict:
-    """
-    Execute quality measures over the dataset
-    :param dfFlights: a dataframe containing flights details
-    :param iatas: a list containing all the iata acronyms
-    :return: a dict containing the quality dimensions
-    """
-    qualities = {}
-    matches = dfFlights.loc[dfFlights['actualDep'].notnull()]
-    qualities["completeness"] = len(list(matches.index)) / len(list(dfFlights.index))
-    acronyms = []
-    for iata in iatas:
-        acronyms.append(iata["acronym"])
-    matches = dfFlights.loc[dfFlights['airportDep'].isin(acronyms)]
-    qualities["consistency"] = len(list(matches.index)) / len(list(dfFlights.index))
-    return qualities
-
-
-def analysisAndQuery(conn: DBConnection, dfFlights: pandas.DataFrame) -> None:
-    """
-    Handle queries, create and print a dict to a csv
-    :param conn: connection object
-    :param dfFlights: a dataframe containing flights details
-    :return: None
-    """
-    airportNames = conn.getDistinctAirportDepNames()
-
-    print("Analysis and queries: \n")
-
-    report = {}
-
-    print("Number of flights grouped by airport")
-    report = handleQuery(conn.flightsGroupedByAirport, airportNames, report, "countFlights")
-    print()
-
-    print("General correlation between delays and weather measures")
-    measures = delaysCorrelations(dfFlights[
-                                      ["delay", "precipitation", "cloud_cover", "wind_speed_10m", "wind_speed_100m"]])
-    printMeasures(measures)
-    print()
-
-    print("Correlation between delays and weather measures grouped by airport")
-    for airport in airportNames:
-        print(airport)
-        subset = dfFlights.loc[dfFlights['airportDep'] == airport]
-        measures = delaysCorrelations(
-            subset[["delay", "precipitation", "cloud_cover", "wind_speed_10m", "wind_speed_100m"]])
-        printMeasures(measures)
-        print()
-
-    print("Mean of the wind speed at 100m grouped by airport [kilometres per hour]")
-    report = handleQuery(conn.meanWindSpeed100mGroupedByAirport, airportNames, report, "meanWind")
-    print()
-
-    print("Mean of the delays grouped by airport [minutes]")
-    report = handleQuery(conn.meanDelaysGroupedByAirport, airportNames, report, "meanDelays")
-    print()
-
-    print("Mean of the delays grouped by airport filtering only wind speed 100m > airport mean respectively [minutes]")
-    report = handleQuery(conn.meanDelaysGroupedByAirportFilteredOnWind100mGt, airportNames, report, "meanWindDelaysGt")
-    print()
-
-    print("Mean of the delays grouped by airport filtering only wind speed 100m < airport mean respectively [minutes]")
-    report = handleQuery(conn.meanDelaysGroupedByAirportFilteredOnWind100mLt, airportNames, report, "meanWindDelaysLte")
-    print()
-
-    print("Mean of the precipitation grouped by airport [millimetres]")
-    report = handleQuery(conn.meanPrecipitationGroupedByAirport, airportNames, report, "meanPrecipitation")
-    print()
-
-    print("Mean of the delays grouped by airport filtering only precipitation > airport mean respectively [minutes]")
-    report = handleQuery(conn.meanDelaysGroupedByAirportFilteredOnPrecipitationGt, airportNames, report,
-                         "meanPrecDelaysGt")
-    print()
-
-    print("Mean of the delays grouped by airport filtering only precipitation < airport mean respectively [minutes]")
-    report = handleQuery(conn.meanDelaysGroupedByAirportFilteredOnPrecipitationLt, airportNames, report,
-                         "meanPrecDelaysLte")
-    print()
-
-    report["windPercentageIncrese"] = percentageIncrease(report["meanWindDelaysLte"], report["meanWindDelaysGt"])
-    report["precPercentageIncrese"] = percentageIncrease(report["meanPrecDelaysLte"], report["meanPrecDelaysGt"])
-
-    reportToCsv(report, fileName="reportQuery")
-
-
-def percentageIncrease(left: dict, right: dict) -> dict:
-    """
-    Calculate the increase from left dict to right dict
-    :param left: a dict containing starting values
-    :param right: a dict containing endind values
-    :return: a dict containing the percentage increases
-    """
-    percentage = {}
-    for el in left:
-        percentage[el] = round(((right[el] / left[el]) - 1) * 100, 3)
-    return percentage
-
-
-def main() -> None:
-    # variable defining the device
-    isServer = False
-
-    # connection to the database
-    print("Connecting to db...")
-    conn = DBConnection()
-    print("Connected to db!\n")
-
-    if isServer:
-        iatas = readIATApdf()
-        insertIATA(conn, iatas)
-        getAndInsertFlights(conn, isServer, iatas)
-        flights = conn.getAllFlights()
-        addMeteoToFlights(conn, flights)
-
-    print("Fetching all iatas...")
-    iatas = conn.getAllIATA()
-    print("IATAS fetched!\n")
-
-    print("Fetching all flights...")
-    flights = conn.getAllFlights()
-    dfFlights = flightsListToDataframe(flights)
-    print("Flights fetched!\n")
-
-    qualities = dataQuality(dfFlights, iatas)
-    for quality in qualities:
-        print(quality + ": " + str(round(qualities[quality], 5)))
-    print()
-
-    analysisAndQuery(conn, dfFlights)
-
-
-if __name__ == '__main__':
-    main()
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import numpy
+import pandas
+from datetime import datetime, timedelta
+
+from airportRegistry import getAirports
+from analyticsEngine import openAnalytics, buildReport, generalCorrelations, qualityMeasures
+from collector import collectFlights, appendMetrics, loadMatcher, runCollector
+from correlations import (correlationStats, poolCorrelationStats, pearsonFromStats, groupedCorrelations,
+                          correlationsToReport)
+from flightSnapshot import refreshSnapshot, loadSnapshot, SNAPSHOT_PATH
+from httpClient import httpGet
+from httpFixtures import useFixtures, REPLAY_STORAGE_URI, FIXTURES_IATA_PATH
+from iataMatcher import IATAMatcher
+from iataReference import IATA_PDF_PATH, IATA_ARTIFACT_PATH
+from meteo import fetchAirportWeather, interpolateWeather, WEATHER_RETRY_DAYS
+from qualityChecks import qualityIndicators, summarizeQuality, qualityByAirportDay
+from responseCache import getCache, makeKey, useCache
+from statsStore import StatsStore
+from storage import FlightStorage, openStorage, WEATHER_STATS
+from utils import printMeasures, flightsCursorToDataframe, splitDatetime, reportToCsv
+
+
+def getAndInsertFlights(conn: FlightStorage, isServer: bool, matcher: IATAMatcher, store=None, maxWorkers=4,
+                        timeout=120.0) -> None:
+    """
+    Get all the flights from each airport concurrently and load them in MongoDB
+    :param conn: connection object
+    :param isServer: boolean that track if the code is running on the server or not
+    :param matcher: IATAMatcher built from the list of all IATAs
+    :param store: StatsStore updated with the flights inserted, None to skip it
+    :param maxWorkers: maximum number of airports scraped at the same time
+    :param timeout: maximum number of seconds to wait for each airport
+    :return: None
+    """
+    print("Scraping airports..")
+    metrics = collectFlights(conn, getAirports(), matcher, store, maxWorkers, timeout)
+    print(f"\nAdded all flights! inserted: {metrics['inserted']}, already present: {metrics['matched']}, "
+          f"failed: {metrics['failed']}\n")
+
+    if isServer:
+        appendMetrics(metrics)
+
+
+def getAirportsCoordinates(flights: list) -> dict:
+    """
+    Get latitude and longitude for each airport using a dedicated API, or the cache if already requested
+    :param flights: list of all the flights
+    :return: A dict having the name of the airport as a key and latitude and longitude as value
+    """
+    # getAirportsCoordinates -> function to obtain latitude and longitude from API for each airport
+    airports = {}
+
+    cache = getCache()
+
+    for flight in flights:
+        if flight["airportDep"] not in airports:
+            # the position of an airport does not change, once found it is kept in the cache forever
+            key = makeKey("coordinates", airport=flight["airportDep"])
+            coordinates = cache.get(key)
+            if coordinates is None:
+                airport = flight["airportDep"].replace(" ", "%20")
+                res = httpGet(f"https://photon.komoot.io/api/?lang=en&limit=5&q={airport}")
+                res = res.json()
+                latitude = res["features"][0]["geometry"]["coordinates"][1]
+                longitude = res["features"][0]["geometry"]["coordinates"][0]
+                coordinates = {"latitude": latitude, "longitude": longitude}
+                cache.set(key, coordinates)
+            airports[flight["airportDep"]] = coordinates
+    return airports
+
+
+def dayForEachAirport(airports: dict, flights: list, maxWorkers=4) -> dict:
+    """
+    Function that create a new dict based on the one with latitude and longitude,
+    in which are stored all the meteo information as a list, the weather of consecutive days
+    is requested at once and the airports are requested concurrently
+    :param airports: a dict having the name of the airport as a key and latitude and longitude as value
+    :param flights: list of all the flights
+    :param maxWorkers: maximum number of airports requested at the same time
+    :return: A dict having the name of the airport as a key and a dict as value,
+    the inner dict has the date as key and the meteo information as a value
+    """
+    airportsNew = {}
+    for flight in flights:
+        if flight["airportDep"] not in airportsNew:
+            airportsNew[flight["airportDep"]] = {}
+        date, schedDep = splitDatetime(flight["scheduledDep"])
+        if date not in airportsNew[flight["airportDep"]]:
+            airportsNew[flight["airportDep"]][date] = {}
+
+    with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+        futures = {}
+        for airportName, dates in airportsNew.items():
+            futures[airportName] = executor.submit(fetchAirportWeather, airports[airportName], list(dates))
+        for airportName, future in futures.items():
+            airportsNew[airportName] = future.result()
+
+    return airportsNew
+
+
+def addMeteoToFlights(conn: FlightStorage, flights: list, store=None) -> None:
+    """
+    Add weather conditions for flight in the database, the weather of all the flights
+    of an airport is interpolated at once and the flights are updated with bulk writes
+    :param conn: connection object
+    :param flights: list of all the flights
+    :param store: StatsStore updated with the stats the flights did not have, None to skip it
+    :return: None
+    """
+
+    airports = getAirportsCoordinates(flights)
+    airports = dayForEachAirport(airports, flights)
+
+    flightsByAirport = {}
+    for flight in flights:
+        found = 0
+
+        for statName in WEATHER_STATS:
+            if statName in flight:
+                found += 1
+
+        if found != len(WEATHER_STATS):
+            if flight["airportDep"] not in flightsByAirport:
+                flightsByAirport[flight["airportDep"]] = []
+            flightsByAirport[flight["airportDep"]].append(flight)
+
+    enriched = []
+    for airport, airportFlights in flightsByAirport.items():
+        values = interpolateWeather([flight["scheduledDep"] for flight in airportFlights], airports[airport])
+        for i, flight in enumerate(airportFlights):
+            added = {}
+            for stat in WEATHER_STATS:
+                if not numpy.isnan(values[stat][i]):
+                    if stat not in flight:
+                        added[stat] = float(values[stat][i])
+                    flight[stat] = float(values[stat][i])
+            enriched.append(flight)
+            if store is not None:
+                store.addWeather(flight, added)
+
+    counts = conn.bulkSetWeather(enriched)
+    print(f"[*] Aggiornati {counts['modified']} voli, falliti {counts['failed']}")
+    if store is not None:
+        store.save()
+
+
+def enrichNewFlights(conn: FlightStorage, retryDays=WEATHER_RETRY_DAYS, store=None) -> None:
+    """
+    Add weather conditions only to the flights still missing them, the latest departure enriched is saved
+    so that flights scheduled more than retryDays before it are not requested anymore
+    and are moved to the weatherUnavailable state
+    :param conn: connection object
+    :param retryDays: number of days a flight without weather is retried
+    :param store: StatsStore updated with the new weather stats, None to skip it
+    :return: None
+    """
+    state = conn.getMeta("weatherEnrichment")
+    since = None
+    if "highWaterMark" in state:
+        since = state["highWaterMark"] - timedelta(retryDays)
+        expired = conn.expirePendingWeather(since)
+        if expired > 0:
+            print(f"{expired} flights without weather after {retryDays} days")
+
+    flights = conn.getFlightsMissingWeather(since)
+    print(f"{len(flights)} flights without weather")
+    if len(flights) == 0:
+        return
+
+    addMeteoToFlights(conn, flights, store)
+
+    highWaterMark = max(flight["scheduledDep"] for flight in flights)
+    if "highWaterMark" in state:
+        highWaterMark = max(highWaterMark, state["highWaterMark"])
+    conn.setMeta("weatherEnrichment", {"highWaterMark": highWaterMark, "lastRun": datetime.now(),
+                                       "processed": len(flights)})
+
+
+def handleQuery(queryFunction: Callable, airportNames: list, report: dict, key: str) -> dict:
+    """
+    Execute the query passed as function and return the prettified response in a dict
+    :param queryFunction: query to execute
+    :param airportNames: a list of airport names in the database
+    :param report: a dict containing the previous query responses
+    :param key: a string explaining the query
+    :return: A dict containing the actual query response
+    """
+    toPrint = {}
+    response = queryFunction()
+    for el in response:
+        keys = list(el.keys())
+        keys.remove("airport")
+        value = el[keys[0]]
+        if value is not None:
+            value = round(value, 3)
+        toPrint[el["airport"]] = value
+    remaining = list(set(airportNames) - set(toPrint.keys()))
+    for el in remaining:
+        toPrint[el] = 0
+    for el in toPrint:
+        print(el + ": " + str(toPrint[el]))
+    report[key] = toPrint
+    return report
+
+
+def dataQuality(dfFlights: pandas.DataFrame, iatas: list, indicators=None) -> dict:
+    """
+    Execute quality measures over the dataset
+    :param dfFlights: a dataframe containing flights details
+    :param iatas: a list containing all the iata acronyms
+    :param indicators: a dataframe returned by qualityIndicators, None to compute it
+    :return: a dict containing the quality dimensions, completeness and consistency are the ones of the
+    actual departures and of the departure airports followed by the measures of qualityIndicators
+    """
+    if indicators is None:
+        indicators = qualityIndicators(dfFlights, {iata["acronym"] for iata in iatas})
+    summary = summarizeQuality(indicators).iloc[0]
+    qualities = {"completeness": float(summary["completeness_actualDep"]),
+                 "consistency": float(summary["consistency_airportDep"])}
+    for measure in summary.index:
+        if measure != "flights":
+            qualities[measure] = float(summary[measure])
+    return qualities
+
+
+def analysisAndQuery(conn: FlightStorage, dfFlights: pandas.DataFrame, store=None) -> None:
+    """
+    Handle queries, create and print a dict to a csv
+    :param conn: connection object
+    :param dfFlights: a dataframe containing flights details
+    :param store: StatsStore serving the per airport measures, None to compute them over all the flights
+    :return: None
+    """
+    airportNames = conn.getDistinctAirportDepNames()
+
+    print("Analysis and queries: \n")
+
+    report = {}
+
+    # all the per airport measures are computed by a single aggregation, or read from the running aggregates
+    if store is None:
+        rows = conn.airportReport()
+    else:
+        rows = store.airportReport()
+
+    print("Number of flights grouped by airport")
+    report = handleQuery(lambda: conn.reportQuery("countFlights", "countFlights", rows=rows), airportNames,
+                         report, "countFlights")
+    print()
+
+    # the statistics of each airport are computed at once, merged they give the general ones
+    stats = correlationStats(dfFlights)
+
+    print("General correlation between delays and weather measures")
+    general = pearsonFromStats(poolCorrelationStats(stats, "measure"))
+    printMeasures(general.to_dict())
+    print()
+
+    print("Correlation between delays and weather measures grouped by airport")
+    correlations = groupedCorrelations(dfFlights, stats=stats)
+    for airport in airportNames:
+        print(airport)
+        measures = correlations.loc[correlations["airport"] == airport].set_index("measure")["pearson"]
+        printMeasures(measures.to_dict())
+        print()
+    report = correlationsToReport(correlations, airportNames, report)
+
+    print("Mean of the wind speed at 100m grouped by airport [kilometres per hour]")
+    report = handleQuery(lambda: conn.reportQuery("meanWind", "meanWind", rows=rows), airportNames,
+                         report, "meanWind")
+    print()
+
+    print("Mean of the delays grouped by airport [minutes]")
+    report = handleQuery(lambda: conn.reportQuery("meanDelays", "meanDelays", rows=rows), airportNames,
+                         report, "meanDelays")
+    print()
+
+    print("Mean of the delays grouped by airport filtering only wind speed 100m > airport mean respectively [minutes]")
+    report = handleQuery(lambda: conn.reportQuery("meanWindDelaysGt", "meanWindDelaysGt", "countWindGt", rows),
+                         airportNames, report, "meanWindDelaysGt")
+    print()
+
+    print("Mean of the delays grouped by airport filtering only wind speed 100m < airport mean respectively [minutes]")
+    report = handleQuery(lambda: conn.reportQuery("meanWindDelaysLte", "meanWindDelaysLte", "countWindLte", rows),
+                         airportNames, report, "meanWindDelaysLte")
+    print()
+
+    print("Mean of the precipitation grouped by airport [millimetres]")
+    report = handleQuery(lambda: conn.reportQuery("meanPrecipitation", "meanPrecipitation", rows=rows), airportNames,
+                         report, "meanPrecipitation")
+    print()
+
+    print("Mean of the delays grouped by airport filtering only precipitation > airport mean respectively [minutes]")
+    report = handleQuery(lambda: conn.reportQuery("meanPrecDelaysGt", "meanPrecDelaysGt", "countPrecGt", rows),
+                         airportNames, report, "meanPrecDelaysGt")
+    print()
+
+    print("Mean of the delays grouped by airport filtering only precipitation < airport mean respectively [minutes]")
+    report = handleQuery(lambda: conn.reportQuery("meanPrecDelaysLte", "meanPrecDelaysLte", "countPrecLte", rows),
+                         airportNames, report, "meanPrecDelaysLte")
+    print()
+
+    report["windPercentageIncrese"] = percentageIncrease(report["meanWindDelaysLte"], report["meanWindDelaysGt"])
+    report["precPercentageIncrese"] = percentageIncrease(report["meanPrecDelaysLte"], report["meanPrecDelaysGt"])
+
+    reportToCsv(report, fileName="reportQuery")
+
+
+def analyticsAndReport(connection, airportNames: list, iatas: list) -> None:
+    """
+    Compute quality measures, correlations and airport report with the analytics engine and print the report to a csv
+    :param connection: a connection returned by openAnalytics
+    :param airportNames: a list of airport names in the database
+    :param iatas: a list containing all the iata acronyms
+    :return: None
+    """
+    qualities = qualityMeasures(connection, iatas)
+    for quality in qualities:
+        print(quality + ": " + str(round(qualities[quality], 5)))
+    print()
+
+    print("General correlation between delays and weather measures")
+    printMeasures({measure: value for measure, value in generalCorrelations(connection).items() if value is not None})
+    print()
+
+    report = buildReport(connection, airportNames)
+    for key in report:
+        print(key)
+        for airport in report[key]:
+            print(airport + ": " + str(report[key][airport]))
+        print()
+
+    reportToCsv(report, fileName="reportQuery")
+
+
+def percentageIncrease(left: dict, right: dict) -> dict:
+    """
+    Calculate the increase from left dict to right dict
+    :param left: a dict containing starting values
+    :param right: a dict containing endind values
+    :return: a dict containing the percentage increases
+    """
+    percentage = {}
+    for el in left:
+        percentage[el] = round(((right[el] / left[el]) - 1) * 100, 3)
+    return percentage
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Flights and weather collection and analysis")
+    parser.add_argument("--server", action="store_true", help="scrape the airports once before the analysis")
+    parser.add_argument("--daemon", action="store_true",
+                        help="keep scraping each airport on its own cadence instead of running the analysis")
+    parser.add_argument("--fixtures", choices=["record", "replay"],
+                        help="save every response as a fixture, or answer every request from the saved ones")
+    parser.add_argument("--engine", choices=["storage", "duckdb"], default="storage",
+                        help="compute the report with the storage queries and pandas, or with DuckDB on the snapshot")
+    parser.add_argument("--no-snapshot", dest="snapshot", action="store_false",
+                        help="download all the flights from the storage instead of refreshing the local snapshot")
+    parser.add_argument("--no-stats-store", dest="statsStore", action="store_false",
+                        help="compute the per airport measures over all the flights instead of the running aggregates")
+    parser.add_argument("--storage",
+                        help="storage to use: a MongoDB uri, mongomock:// or sqlite:///path, "
+                             "by default the FLIGHTS_STORAGE_URI variable or the cluster, "
+                             "an in-memory SQLite when replaying the fixtures")
+    args = parser.parse_args()
+    if args.engine == "duckdb" and not args.snapshot:
+        parser.error("--engine duckdb runs on the snapshot, it can not be used with --no-snapshot")
+
+    if args.fixtures is not None:
+        useFixtures(args.fixtures)
+
+    # variable defining if the run replays the fixtures, the replayed responses and flights are not
+    # written to the configured storage, the response cache, the snapshot or the metrics
+    isReplay = args.fixtures == "replay"
+    storageUri = args.storage
+    snapshotPath = SNAPSHOT_PATH
+    iataPaths = (IATA_PDF_PATH, IATA_ARTIFACT_PATH)
+    if isReplay:
+        iataPaths = (None, FIXTURES_IATA_PATH)
+        if storageUri is None:
+            storageUri = REPLAY_STORAGE_URI
+        useCache(":memory:")
+        snapshotPath = tempfile.mkdtemp(prefix="snapshot-")
+
+    # variable defining the device
+    isServer = args.server
+    # variable defining if the analysis runs on the local snapshot of the flights
+    useSnapshot = args.snapshot
+    # variable defining if the per airport measures are read from the running aggregates
+    useStatsStore = args.statsStore
+
+    # connection to the database
+    print("Connecting to db...")
+    conn = openStorage(storageUri)
+    print("Connected to db!")
+    for collection, indexes in conn.indexes.items():
+        for name, index in indexes.items():
+            size = "unknown size" if index["size"] is None else f"{index['size']} bytes"
+            print(f"{collection}.{name}: {index['status']}, {size}")
+    print()
+
+    store = None
+    if useStatsStore:
+        store = StatsStore(conn)
+        if not store.isBuilt():
+            # built once from all the flights, then kept updated by the insertions and the enrichment
+            print(f"{store.rebuild()} flights added to the stats store")
+
+    if args.daemon:
+        runCollector(conn, store, lambda: enrichNewFlights(conn, store=store), iataPaths=iataPaths)
+        return
+
+    if isServer:
+        # the pdf is parsed only when it changes, the collection is synced only when the pdf changes
+        matcher, _ = loadMatcher(conn, iataPaths)
+        getAndInsertFlights(conn, isServer and not isReplay, matcher, store)
+        enrichNewFlights(conn, store=store)
+
+    print("Fetching all iatas...")
+    iatas = conn.getAllIATA()
+    print("IATAS fetched!\n")
+
+    if args.engine == "duckdb":
+        print(f"{refreshSnapshot(conn, snapshotPath)} flights added to the snapshot")
+        analyticsAndReport(openAnalytics(snapshotPath), conn.getDistinctAirportDepNames(), iatas)
+        return
+
+    print("Fetching all flights...")
+    if useSnapshot:
+        # only the flights added or enriched since the last run are downloaded
+        print(f"{refreshSnapshot(conn, snapshotPath)} flights added to the snapshot")
+        dfFlights = loadSnapshot(snapshotPath)
+    else:
+        dfFlights = flightsCursorToDataframe(conn)
+    print("Flights fetched!\n")
+
+    # the indicators of each flight are computed once and aggregated overall and by airport and day
+    indicators = qualityIndicators(dfFlights, {iata["acronym"] for iata in iatas})
+    qualities = dataQuality(dfFlights, iatas, indicators)
+    for quality in qualities:
+        print(quality + ": " + str(round(qualities[quality], 5)))
+    print()
+    qualityByAirportDay(indicators).to_csv("./airportsDetails/qualityByAirportDay.csv", index=False)
+
+    analysisAndQuery(conn, dfFlights, store)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from httpClient import httpGet
+from responseCache import getCache, makeKey
+from storage import WEATHER_STATS
+
+# longest range requested in a single call to the weather archive
+MAX_RANGE_DAYS = 366
+
+# days older than this are final in the weather archive, more recent ones can still be revised
+FINAL_AFTER_DAYS = 7
+
+# seconds the weather of a day that can still be revised is kept in the cache
+RECENT_TTL = 6 * 60 * 60
+
+# days a flight without weather is requested again, counted back from the latest departure enriched
+WEATHER_RETRY_DAYS = 30
+
+
+def contiguousDateRanges(dates: list, maxDays=MAX_RANGE_DAYS) -> list:
+    """
+    Group the dates in ranges of consecutive days
+    :param dates: a list of strings containing dates in the format YYYY-MM-DD
+    :param maxDays: maximum number of days in a single range
+    :return: a list of tuples containing the first and the last date of each range
+    """
+    days = sorted(set(datetime.strptime(date, "%Y-%m-%d").date() for date in dates))
+    ranges = []
+    for day in days:
+        if len(ranges) > 0 and day - ranges[-1][1] == timedelta(1) and (day - ranges[-1][0]).days < maxDays:
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [(start.isoformat(), end.isoformat()) for start, end in ranges]
+
+
+def fetchWeatherRange(latitude: float, longitude: float, startDate: str, endDate: str) -> dict:
+    """
+    Get the hourly weather of a location for a range of days from the weather archive
+    :param latitude: latitude of the location
+    :param longitude: longitude of the location
+    :param startDate: a string containing the first date in the format YYYY-MM-DD
+    :param endDate: a string containing the last date in the format YYYY-MM-DD
+    :return: a dict containing the response of the weather archive
+    """
+    res = httpGet(
+        f"https://archive-api.open-meteo.com/v1/archive?latitude={latitude}&longitude={longitude}&start_date={startDate}&end_date={endDate}&hourly={','.join(WEATHER_STATS)}&timezone=GMT")
+    return res.json()
+
+
+def splitHourlyByDay(response: dict) -> dict:
+    """
+    Split a weather response covering many days into one response for each day
+    :param response: a dict containing the response of the weather archive
+    :return: a dict having the date as key and the response restricted to that date as value
+    """
+    days = {}
+    hourly = response["hourly"]
+    for i, time in enumerate(hourly["time"]):
+        date = time[:10]
+        if date not in days:
+            days[date] = {key: value for key, value in response.items() if key != "hourly"}
+            days[date]["hourly"] = {key: [] for key in hourly}
+        for key in hourly:
+            days[date]["hourly"][key].append(hourly[key][i])
+    return days
+
+
+def weatherTtl(date: str, day: dict):
+    """
+    Returns how long the weather of a day can be kept in the cache
+    :param date: a string containing the date in the format YYYY-MM-DD
+    :param day: a dict containing the weather information of the day
+    :return: None if the weather will not change anymore, the number of seconds to keep it otherwise
+    """
+    age = datetime.now() - datetime.strptime(date, "%Y-%m-%d")
+    missing = any(value is None for stat in WEATHER_STATS for value in day["hourly"].get(stat, [None]))
+    if age.days > FINAL_AFTER_DAYS and not missing:
+        return None
+    return RECENT_TTL
+
+
+def fetchAirportWeather(coordinates: dict, dates: list) -> dict:
+    """
+    Get the hourly weather of an airport for each date making one request for each range of consecutive days,
+    the days already in the cache are not requested
+    :param coordinates: a dict containing latitude and longitude of the airport
+    :param dates: a list of strings containing dates in the format YYYY-MM-DD
+    :return: a dict having the date as key and the weather information as value
+    """
+    cache = getCache()
+    weather = {}
+    missingDates = []
+    for date in dates:
+        day = cache.get(makeKey("weather", latitude=coordinates["latitude"], longitude=coordinates["longitude"],
+                                date=date))
+        if day is None:
+            missingDates.append(date)
+        else:
+            weather[date] = day
+
+    for startDate, endDate in contiguousDateRanges(missingDates):
+        response = fetchWeatherRange(coordinates["latitude"], coordinates["longitude"], startDate, endDate)
+        if "hourly" not in response:
+            # error returned by the weather archive, kept for each date as it is
+            for date in missingDates:
+                if startDate <= date <= endDate:
+                    weather[date] = response
+            continue
+        for date, day in splitHourlyByDay(response).items():
+            weather[date] = day
+            cache.set(makeKey("weather", latitude=coordinates["latitude"], longitude=coordinates["longitude"],
+                              date=date), day, weatherTtl(date, day))
+    return weather
+
+
+def hourlySeries(days: dict) -> (np.ndarray, dict, np.ndarray):
+    """
+    Load the hourly weather of an airport in arrays sorted by hour
+    :param days: a dict having the date as key and the weather information of the day as value
+    :return: an array containing the hours counted from the epoch, a dict having the stat as key and an array with its values as value
+    (None values are NaN) and an array telling if the hour is the last one available for its day
+    """
+    times = []
+    values = {stat: [] for stat in WEATHER_STATS}
+    lastOfDay = []
+    for day in days.values():
+        if "hourly" not in day or len(day["hourly"]["time"]) == 0:
+            continue
+        times += day["hourly"]["time"]
+        for stat in WEATHER_STATS:
+            values[stat] += day["hourly"][stat]
+        lastOfDay += [False] * (len(day["hourly"]["time"]) - 1) + [True]
+
+    hours = np.array(times, dtype="datetime64[h]").astype(np.int64)
+    order = np.argsort(hours, kind="stable")
+    for stat in WEATHER_STATS:
+        values[stat] = np.array(values[stat], dtype=float)[order]
+    return hours[order], values, np.array(lastOfDay, dtype=bool)[order]
+
+
+def interpolateWeather(scheduledDeps: list, days: dict) -> dict:
+    """
+    Interpolate the weather stats at the scheduled departure of every flight of an airport,
+    the value is weighted between the hour of the departure and the following one of the same day,
+    in the last hour of the day the value of the hour is used as it is
+    :param scheduledDeps: a list containing the scheduled departures of the flights as datetime
+    :param days: a dict having the date as key and the weather information of the day as value
+    :return: a dict having the stat as key and an array with the value for each flight as value,
+    NaN when the weather is not available
+    """
+    hours, values, lastOfDay = hourlySeries(days)
+
+    # wall clock hour of the departure counted from the epoch, like the hours of the weather series
+    epochOrdinal = datetime(1970, 1, 1).toordinal()
+    flightHours = np.array([(dep.toordinal() - epochOrdinal) * 24 + dep.hour for dep in scheduledDeps],
+                           dtype=np.int64)
+    percentageHour = np.array([dep.minute / 60 for dep in scheduledDeps], dtype=float)
+
+    interpolated = {stat: np.full(len(flightHours), np.nan) for stat in WEATHER_STATS}
+    if len(hours) == 0:
+        return interpolated
+
+    index = np.minimum(np.searchsorted(hours, flightHours), len(hours) - 1)
+    found = hours[index] == flightHours
+    last = found & lastOfDay[index]
+    inner = found & ~last
+    nextIndex = np.minimum(index + 1, len(hours) - 1)
+
+    for stat in WEATHER_STATS:
+        # NaN values propagate, so an interpolation with a missing bound stays NaN
+        left = values[stat][index]
+        right = values[stat][nextIndex]
+        weighted = left * (1 - percentageHour) + right * percentageHour
+        interpolated[stat][inner] = np.round(weighted[inner], 4)
+        interpolated[stat][last] = left[last]
+    return interpolated
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas
+import pandas as pd
+
+from utils import ANALYSIS_FIELDS
+
+# fields identifying a flight, as the unique index of the flights
+DEDUP_KEY = ["scheduledDep", "actualDep", "airportDep", "airportArr"]
+
+
+def insertionTimes(ids: pandas.Series) -> pandas.Series:
+    """
+    Extract the insertion time of each flight from the timestamp in the first 4 bytes of the ObjectId
+    :param ids: a series containing the _ids as ObjectId or hex strings
+    :return: a series containing the UTC insertion times, NaT for the _ids that are not ObjectIds
+    """
+    prefixes = ids.astype(str).str[:8]
+    valid = prefixes.str.fullmatch("[0-9a-fA-F]{8}").fillna(False).to_numpy(dtype=bool)
+    seconds = np.full(len(ids), np.nan)
+    # all the prefixes are decoded at once as big endian integers
+    seconds[valid] = np.frombuffer(bytes.fromhex("".join(prefixes[valid].tolist())), dtype=">u4")
+    return pd.Series(pd.to_datetime(seconds, unit="s", utc=True), index=ids.index)
+
+
+def qualityIndicators(dfFlights: pandas.DataFrame, acronyms) -> pandas.DataFrame:
+    """
+    Compute the quality indicators of each flight in a single vectorized pass
+    :param dfFlights: a dataframe containing flights details
+    :param acronyms: a collection containing all the iata acronyms
+    :return: a dataframe with a row for each flight containing airport, day and the indicators:
+    completeness of each field, consistency of the airports, ingestion lag in minutes,
+    duplication of the flight key and validity of the delay
+    """
+    acronyms = pd.Index(list(acronyms)).unique()
+    scheduled = pd.to_datetime(dfFlights["scheduledDep"], utc=True, errors="coerce")
+    actual = pd.to_datetime(dfFlights["actualDep"], utc=True, errors="coerce")
+
+    indicators = pd.DataFrame({
+        "airport": dfFlights["airportDep"].astype(object).fillna("unknown").to_numpy(),
+        "day": scheduled.dt.floor("D").array,
+    }, index=dfFlights.index)
+    for field in ANALYSIS_FIELDS:
+        indicators["completeness_" + field] = dfFlights[field].notna().to_numpy()
+    indicators["consistency_airportDep"] = dfFlights["airportDep"].isin(acronyms).to_numpy()
+    indicators["consistency_airportArr"] = dfFlights["airportArr"].isin(acronyms).to_numpy()
+
+    # minutes between the departure and the insertion in the database, the scheduled one for cancelled flights
+    ids = pd.Series(dfFlights["_id"].to_numpy(), index=dfFlights.index)
+    departures = actual.fillna(scheduled)
+    indicators["ingestionLag"] = ((insertionTimes(ids) - departures).dt.total_seconds() / 60).to_numpy()
+
+    indicators["duplicated"] = dfFlights.duplicated(DEDUP_KEY, keep="first").to_numpy()
+    # negative delays are nulled by createDelaysColumn, here they are counted as invalid
+    delays = (actual - scheduled).dt.total_seconds()
+    indicators["validDelay"] = ~(delays < 0).to_numpy()
+    return indicators
+
+
+def summarizeQuality(indicators: pandas.DataFrame, groupBy=None) -> pandas.DataFrame:
+    """
+    Aggregate the indicators as rates, the ingestion lag as median
+    :param indicators: a dataframe returned by qualityIndicators
+    :param groupBy: a list containing the columns to group by, None to aggregate all the flights
+    :return: a dataframe with a row for each group containing the number of flights and the measures
+    """
+    rates = [column for column in indicators.columns if column not in ["airport", "day", "ingestionLag"]]
+    if groupBy is None:
+        summary = indicators[rates].mean().to_frame().T
+        summary.insert(0, "flights", len(indicators))
+        summary["ingestionLag"] = indicators["ingestionLag"].median()
+        return summary
+    grouped = indicators.groupby(groupBy, sort=True, dropna=False)
+    summary = grouped[rates].mean()
+    summary.insert(0, "flights", grouped.size())
+    summary["ingestionLag"] = grouped["ingestionLag"].median()
+    return summary.reset_index()
+
+
+def qualityByAirportDay(indicators: pandas.DataFrame) -> pandas.DataFrame:
+    """
+    Execute quality measures over the dataset for each departure airport and day
+    :param indicators: a dataframe returned by qualityIndicators
+    :return: a dataframe with a row for each airport and day containing the quality measures
+    """
+    return summarizeQuality(indicators, ["airport", "day"])
@@ -0,0 +1,87 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+CACHE_PATH = "responses.sqlite"
+
+cache = None
+cacheLock = threading.Lock()
+
+
+class ResponseCache:
+    """
+    Persistent cache of API responses stored as compressed json in a SQLite file
+    """
+
+    def __init__(self, path=CACHE_PATH):
+        """
+        Open the cache file creating it if needed
+        :param path: a string containing the path of the SQLite file
+        """
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value BLOB NOT NULL, expiresAt REAL)")
+        self.connection.commit()
+
+    def get(self, key: str):
+        """
+        Returns a cached response if present and not expired
+        :param key: a string identifying the request
+        :return: the cached response, None if missing or expired
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT value, expiresAt FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return json.loads(zlib.decompress(row[0]).decode("utf8"))
+
+    def set(self, key: str, value, ttl=None) -> None:
+        """
+        Store a response in the cache
+        :param key: a string identifying the request
+        :param value: the response to store, it must be serializable as json
+        :param ttl: number of seconds the response is valid, None if it never expires
+        :return: None
+        """
+        expiresAt = None if ttl is None else time.time() + ttl
+        blob = zlib.compress(json.dumps(value).encode("utf8"))
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO responses (key, value, expiresAt) VALUES (?, ?, ?)",
+                                    (key, blob, expiresAt))
+            self.connection.commit()
+
+
+def makeKey(kind: str, **params) -> str:
+    """
+    Build the cache key of a request
+    :param kind: a string containing the type of the request
+    :param params: the parameters of the request
+    :return: a string identifying the request
+    """
+    return kind + ":" + json.dumps(params, sort_keys=True)
+
+
+def getCache() -> ResponseCache:
+    """
+    Returns the cache shared by every request, opening it the first time
+    :return: a ResponseCache object
+    """
+    global cache
+    with cacheLock:
+        if cache is None:
+            cache = ResponseCache()
+        return cache
+
+
+def useCache(path: str) -> None:
+    """
+    Replace the cache shared by every request with the one in the given file
+    :param path: a string containing the path of the SQLite file, :memory: for a cache that is not persisted
+    :return: None
+    """
+    global cache
+    with cacheLock:
+        cache = ResponseCache(path)
@@ -0,0 +1,122 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable
+
+
+def timedCall(function: Callable, args: tuple, started: dict, name: str):
+    """
+    Execute a function storing the moment in which it really started
+    :param function: function to execute
+    :param args: a tuple containing the arguments of the function
+    :param started: a dict where the starting time is saved
+    :param name: a string containing the key to use in the started dict
+    :return: the value returned by the function
+    """
+    started[name] = time.monotonic()
+    return function(*args)
+
+
+def runScrapers(scrapers: dict, args: tuple, maxWorkers=4, timeout=120.0, pollInterval=0.5, sink=None) -> dict:
+    """
+    Execute the scrapers concurrently, a scraper that fails or exceeds the timeout is skipped
+    without stopping the others
+    :param scrapers: a dict having the name of the airport as key and the scraper function as value
+    :param args: a tuple containing the arguments to pass to each scraper
+    :param maxWorkers: maximum number of scrapers running at the same time
+    :param timeout: maximum number of seconds each scraper can run
+    :param pollInterval: number of seconds between each check of the running scrapers
+    :param sink: function called with the name of the airport and its flights as soon as a scraper ends,
+    while the others are still running, None to only return the flights
+    :return: a dict having the name of the airport as key and a dict as value,
+    the inner dict contains the flights, the error (if any) and the elapsed seconds
+    """
+    results = {}
+    started = {}
+    executor = ThreadPoolExecutor(max_workers=maxWorkers)
+    futures = {executor.submit(timedCall, scraper, args, started, name): name for name, scraper in scrapers.items()}
+    pending = set(futures)
+
+    while len(pending) > 0:
+        done, pending = wait(pending, timeout=pollInterval, return_when=FIRST_COMPLETED)
+        now = time.monotonic()
+
+        for future in done:
+            name = futures[future]
+            elapsed = now - started.get(name, now)
+            try:
+                results[name] = {"flights": future.result(), "error": None, "seconds": elapsed}
+                print(f"[+] {name}: {len(results[name]['flights'])} flights in {round(elapsed, 2)}s")
+            except Exception as e:
+                results[name] = {"flights": [], "error": repr(e), "seconds": elapsed}
+                print(f"[-] {name}: {repr(e)}")
+                continue
+            if sink is not None:
+                try:
+                    sink(name, results[name]["flights"])
+                except Exception as e:
+                    results[name]["error"] = repr(e)
+                    print(f"[-] {name}: {repr(e)}")
+
+        # scrapers running for too long are abandoned, their thread ends in background
+        for future in list(pending):
+            name = futures[future]
+            if name in started and now - started[name] > timeout:
+                future.cancel()
+                pending.remove(future)
+                results[name] = {"flights": [], "error": f"timeout after {timeout}s", "seconds": now - started[name]}
+                print(f"[-] {name}: timeout after {timeout}s")
+
+    executor.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+def scrapeAirport(airport, matcher, phases: dict) -> list:
+    """
+    Fetch, parse and clean the flights of an airport timing each phase,
+    the flights found more than once in the departures are kept once
+    :param airport: an AirportScraper object
+    :param matcher: IATAMatcher built from the list of all IATAs
+    :param phases: a dict where the seconds of each phase are saved
+    :return: a list containing the cleaned flights
+    """
+    started = time.monotonic()
+    raw = airport.fetch()
+    phases["fetch"] = time.monotonic() - started
+
+    started = time.monotonic()
+    records = airport.parse(raw)
+    phases["parse"] = time.monotonic() - started
+
+    started = time.monotonic()
+    flights = []
+    seen = set()
+    for record in records:
+        flight = airport.clean(record, matcher)
+        if flight is None:
+            continue
+        key = tuple(flight.items())
+        if key not in seen:
+            seen.add(key)
+            flights.append(flight)
+    phases["clean"] = time.monotonic() - started
+    return flights
+
+
+def runAirports(airports: dict, matcher, sink=None, maxWorkers=4, timeout=120.0) -> dict:
+    """
+    Scrape the registered airports concurrently
+    :param airports: a dict having the name of the airport as key and the AirportScraper as value
+    :param matcher: IATAMatcher built from the list of all IATAs
+    :param sink: function called with the name of the airport and its flights as soon as the airport is scraped
+    :param maxWorkers: maximum number of airports scraped at the same time
+    :param timeout: maximum number of seconds each airport can run
+    :return: a dict having the name of the airport as key and a dict as value,
+    the inner dict contains the flights, the error (if any), the elapsed seconds and the seconds of each phase
+    """
+    phases = {name: {} for name in airports}
+    scrapers = {name: lambda airport=airport: scrapeAirport(airport, matcher, phases[airport.name])
+                for name, airport in airports.items()}
+    results = runScrapers(scrapers, (), maxWorkers=maxWorkers, timeout=timeout, sink=sink)
+    for name, result in results.items():
+        result["phases"] = {phase: round(seconds, 3) for phase, seconds in phases[name].items()}
+    return results
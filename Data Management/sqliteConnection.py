@@ -0,0 +1,639 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+from bson import ObjectId
+
+from storage import AIRPORT_REPORT_QUERY, WEATHER_STATS, FlightStorage, toUtc
+
+SQLITE_PATH = "flights.sqlite"
+
+# fields of the flights stored in their own column, the others are kept as json in the extra column
+FLIGHT_COLUMNS = ["number", "status", "scheduledDep", "actualDep", "airportDep", "airportArr",
+                  "weatherPending"] + WEATHER_STATS
+DATETIME_COLUMNS = ["scheduledDep", "actualDep"]
+
+# operators of the MongoDB filters accepted by iterFlights
+OPERATORS = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+# per airport report over the flights table, the delays are counted in minute boundaries as $dateDiff does
+AIRPORT_REPORT_QUERY = """
+    WITH delays AS (
+        SELECT airportDep, wind_speed_100m, precipitation,
+            (CAST(strftime('%s', substr(actualDep, 1, 16)) AS INTEGER)
+             - CAST(strftime('%s', substr(scheduledDep, 1, 16)) AS INTEGER)) / 60 AS delays
+        FROM flights
+    ),
+    means AS (
+        SELECT *,
+            AVG(wind_speed_100m) OVER (PARTITION BY airportDep) AS meanWind,
+            AVG(precipitation) OVER (PARTITION BY airportDep) AS meanPrecipitation
+        FROM delays
+    )
+    SELECT airportDep AS airport,
+        COUNT(*) AS countFlights,
+        MAX(meanWind) AS meanWind,
+        AVG(delays) AS meanDelays,
+        AVG(CASE WHEN wind_speed_100m > meanWind THEN delays END) AS meanWindDelaysGt,
+        COUNT(CASE WHEN wind_speed_100m > meanWind THEN 1 END) AS countWindGt,
+        AVG(CASE WHEN wind_speed_100m <= meanWind THEN delays END) AS meanWindDelaysLte,
+        COUNT(CASE WHEN wind_speed_100m <= meanWind THEN 1 END) AS countWindLte,
+        MAX(meanPrecipitation) AS meanPrecipitation,
+        AVG(CASE WHEN precipitation > meanPrecipitation THEN delays END) AS meanPrecDelaysGt,
+        COUNT(CASE WHEN precipitation > meanPrecipitation THEN 1 END) AS countPrecGt,
+        AVG(CASE WHEN precipitation <= meanPrecipitation THEN delays END) AS meanPrecDelaysLte,
+        COUNT(CASE WHEN precipitation <= meanPrecipitation THEN 1 END) AS countPrecLte
+    FROM means
+    GROUP BY airportDep
+"""
+
+
+def encodeValue(value):
+    """
+    Convert a value of a document to the value stored in SQLite
+    :param value: the value of the document
+    :return: the value to store
+    """
+    if isinstance(value, datetime):
+        return toUtc(value).strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def encodeJson(value):
+    """
+    Serialize the values json does not support
+    :param value: a value of a document
+    :return: a dict that decodeJson converts back
+    """
+    if isinstance(value, datetime):
+        return {"$date": toUtc(value).isoformat()}
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    raise TypeError(f"{type(value)} is not serializable")
+
+
+def decodeJson(document: dict):
+    """
+    Convert back the values serialized by encodeJson
+    :param document: a dict decoded from json
+    :return: the original value
+    """
+    if len(document) == 1 and "$date" in document:
+        return datetime.fromisoformat(document["$date"])
+    if len(document) == 1 and "$oid" in document:
+        return ObjectId(document["$oid"])
+    return document
+
+
+def dumpDocument(document: dict) -> str:
+    """
+    :param document: a dict
+    :return: a string containing the document as json
+    """
+    return json.dumps(document, default=encodeJson, ensure_ascii=False)
+
+
+def loadDocument(text: str) -> dict:
+    """
+    :param text: a string returned by dumpDocument
+    :return: the document
+    """
+    return json.loads(text, object_hook=decodeJson)
+
+
+class SQLiteConnection(FlightStorage):
+    """
+    Storage backend keeping flights, IATAs, state of the processing steps and running aggregates
+    in an embedded SQLite file, with the same methods of DBConnection
+    """
+
+    def __init__(self, path=SQLITE_PATH):
+        """
+        Open the SQLite file creating the tables if needed
+        :param path: a string containing the path of the SQLite file, :memory: to keep it in memory
+        """
+        self.path = path
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.lock:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS flights (
+                    _id TEXT PRIMARY KEY, number TEXT, status TEXT, scheduledDep TEXT, actualDep TEXT,
+                    airportDep TEXT, airportArr TEXT, weatherPending INTEGER, precipitation REAL,
+                    cloud_cover REAL, wind_speed_10m REAL, wind_speed_100m REAL, extra TEXT);
+                CREATE TABLE IF NOT EXISTS iata (_id TEXT PRIMARY KEY, acronym TEXT, name TEXT);
+                CREATE TABLE IF NOT EXISTS meta (_id TEXT PRIMARY KEY, doc TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS stats (_id TEXT PRIMARY KEY, doc TEXT NOT NULL);
+            """)
+        self.indexes = self.ensureIndexes()
+
+    def createIndex(self, table: str, name: str, columns: str, unique=False, where=None) -> str:
+        """
+        Create an index if it does not exist, a unique index that can not be built because of duplicated
+        rows is created as a normal index
+        :param table: a string containing the table to index
+        :param name: a string containing the name of the index
+        :param columns: a string containing the indexed columns or expressions
+        :param unique: true if the index has to reject duplicated keys
+        :param where: a string containing the condition of the rows to index, None to index all of them
+        :return: a string containing the build status
+        """
+        existing = self.connection.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?",
+                                           (name,)).fetchone()
+        if existing is not None:
+            if unique and not existing["sql"].upper().startswith("CREATE UNIQUE"):
+                return "exists, not unique (duplicated documents in the collection)"
+            return "exists"
+        condition = "" if where is None else f" WHERE {where}"
+        try:
+            with self.connection:
+                self.connection.execute(
+                    f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({columns}){condition}")
+            return "created"
+        except sqlite3.IntegrityError:
+            with self.connection:
+                self.connection.execute(f"CREATE INDEX {name} ON {table} ({columns}){condition}")
+            return "created, not unique (duplicated documents in the collection)"
+
+    def ensureIndexes(self) -> dict:
+        """
+        Create the indexes used for deduplication and aggregations
+        :return: a dict having the table name as a key and a dict as value,
+        the inner dict has the index name as key and its status and size as value
+        """
+        # missing values are equal in the flight key as they are in MongoDB
+        flightKey = "IFNULL(scheduledDep, ''), IFNULL(actualDep, ''), IFNULL(airportDep, ''), IFNULL(airportArr, '')"
+        indexes = {
+            "flights": [
+                ("flightKey", flightKey, True, None),
+                ("airportDepScheduledDep", "airportDep, scheduledDep", False, None),
+                # only the flights still waiting for the weather are indexed
+                ("weatherPending", "scheduledDep", False, "weatherPending IS NOT NULL"),
+            ],
+            "iata": [
+                ("acronym", "acronym", True, None),
+            ],
+        }
+        report = {}
+        statuses = {}
+        with self.lock:
+            for table, definitions in indexes.items():
+                report[table] = {}
+                for name, columns, unique, where in definitions:
+                    statuses[name] = self.createIndex(table, name, columns, unique, where)
+                    report[table][name] = {"status": statuses[name], "size": None}
+
+        if statuses["weatherPending"] == "created":
+            # flights inserted before the index existed are not flagged yet
+            self.markPendingWeather()
+        return report
+
+    def flightToRow(self, flight: dict) -> dict:
+        """
+        Convert a flight to the values of its row
+        :param flight: a flight
+        :return: a dict having the column as key and the value to store as value
+        """
+        row = {column: encodeValue(flight.get(column)) for column in FLIGHT_COLUMNS}
+        extra = {key: value for key, value in flight.items() if key not in FLIGHT_COLUMNS and key != "_id"}
+        row["extra"] = dumpDocument(extra) if len(extra) > 0 else None
+        return row
+
+    def rowToFlight(self, row: sqlite3.Row) -> dict:
+        """
+        Convert a row to a flight shaped like the documents returned by MongoDB,
+        missing weather stats and pending flag are left out as they are not in the documents
+        :param row: a row of the flights table
+        :return: a flight
+        """
+        flight = {}
+        for key in row.keys():
+            value = row[key]
+            if key == "_id":
+                flight["_id"] = ObjectId(value)
+            elif key == "extra":
+                if value is not None:
+                    flight.update(loadDocument(value))
+            elif key in DATETIME_COLUMNS:
+                flight[key] = None if value is None else datetime.fromisoformat(value)
+            elif key == "weatherPending":
+                if value is not None:
+                    flight[key] = True
+            elif key in WEATHER_STATS:
+                if value is not None:
+                    flight[key] = value
+            else:
+                flight[key] = value
+        return flight
+
+    def keyCondition(self, element: dict) -> (str, tuple):
+        """
+        Build the condition matching the flights with the same key of a flight
+        :param element: a flight
+        :return: a string containing the condition and a tuple containing its parameters
+        """
+        key = self.getFlightKey(element)
+        condition = " AND ".join(f"IFNULL({column}, '') = ?" for column in key)
+        return condition, tuple("" if value is None else encodeValue(value) for value in key.values())
+
+    def isFlightInDatabase(self, element: dict) -> bool:
+        """
+        Check if a flight is in the database using only some parameters
+        :param element: a flight
+        :return: true if the flight is already in the database, false if not
+        """
+        return self.countInDatabase(element) > 0
+
+    def isIATAInDatabase(self, iata: str) -> bool:
+        """
+        Check if a IATA is in the database
+        :param iata: IATA acronym to check
+        :return: true if the IATA is already in the database, false if not
+        """
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM iata WHERE acronym = ?", (iata,)).fetchone() is not None
+
+    def countInDatabase(self, element: dict) -> int:
+        """
+        Count how many appearence of a flight are in the database using only some parameters
+        :param element: a flight
+        :return: the counter of similar flight in the database
+        """
+        condition, params = self.keyCondition(element)
+        with self.lock:
+            return self.connection.execute(f"SELECT COUNT(*) FROM flights WHERE {condition}", params).fetchone()[0]
+
+    def insertRow(self, table: str, row: dict, ignoreDuplicates=False) -> bool:
+        """
+        Insert a row in a table
+        :param table: a string containing the table
+        :param row: a dict having the column as key
+        :param ignoreDuplicates: true to skip the rows violating a unique index
+        :return: true if the row was inserted
+        """
+        columns = ", ".join(row)
+        placeholders = ", ".join("?" for column in row)
+        conflict = " ON CONFLICT DO NOTHING" if ignoreDuplicates else ""
+        cursor = self.connection.execute(f"INSERT INTO {table} ({columns}) VALUES ({placeholders}){conflict}",
+                                         tuple(row.values()))
+        return cursor.rowcount == 1
+
+    def insertOneFlight(self, element: dict) -> None:
+        """
+        Insert a flight in the database checking if it is already inserted
+        :param element: a flight
+        :return: None
+        """
+        row = dict(_id=str(element.get("_id", ObjectId())), **self.flightToRow(element))
+        with self.lock, self.connection:
+            inserted = self.insertRow("flights", row, True)
+        if inserted:
+            print(f"[+] Caricato {element['number']} {element['scheduledDep']}")
+
+    def bulkUpsertFlights(self, flights: list, batchSize=1000) -> dict:
+        """
+        Insert the flights not already in the database, a transaction is committed for each batch
+        :param flights: a list of flights
+        :param batchSize: maximum number of flights written in a single transaction
+        :return: a dict containing the number of inserted, matched and failed flights
+        and the list of the flights inserted
+        """
+        keys = set()
+        unique = []
+        duplicates = 0
+        for flight in flights:
+            hashableKey = tuple(self.getFlightKey(flight).values())
+            if hashableKey in keys:
+                # same flight scraped twice in this cycle
+                duplicates += 1
+                continue
+            keys.add(hashableKey)
+            unique.append(flight)
+
+        inserted = []
+        failed = 0
+        for start in range(0, len(unique), batchSize):
+            with self.lock, self.connection:
+                for flight in unique[start: start + batchSize]:
+                    try:
+                        row = dict(_id=str(ObjectId()), **self.flightToRow(dict(flight, weatherPending=True)))
+                        if self.insertRow("flights", row, True):
+                            inserted.append(flight)
+                    except (sqlite3.Error, TypeError, ValueError):
+                        failed += 1
+        return {"inserted": len(inserted), "matched": len(unique) - len(inserted) - failed + duplicates,
+                "failed": failed, "insertedFlights": inserted}
+
+    def getAllFlights(self) -> list:
+        """
+        :return: All the flights in the database
+        """
+        with self.lock:
+            return [self.rowToFlight(row) for row in self.connection.execute("SELECT * FROM flights")]
+
+    def queryCondition(self, query: dict) -> (str, list):
+        """
+        Translate a MongoDB filter on the flights to a SQL condition, equality and the operators
+        $gt, $gte, $lt, $lte, $in and $exists are supported
+        :param query: a dict containing the filter
+        :return: a string containing the condition and a list containing its parameters
+        """
+        conditions = []
+        params = []
+        for field, value in query.items():
+            if field not in FLIGHT_COLUMNS and field != "_id":
+                raise ValueError(f"Unsupported filter on {field}")
+            if not isinstance(value, dict):
+                if value is None:
+                    conditions.append(f"{field} IS NULL")
+                else:
+                    conditions.append(f"{field} = ?")
+                    params.append(encodeValue(value))
+                continue
+            for operator, operand in value.items():
+                if operator in OPERATORS:
+                    conditions.append(f"{field} {OPERATORS[operator]} ?")
+                    params.append(encodeValue(operand))
+                elif operator == "$in":
+                    conditions.append(f"{field} IN ({', '.join('?' for element in operand)})")
+                    params += [encodeValue(element) for element in operand]
+                elif operator == "$exists":
+                    conditions.append(f"{field} IS {'NOT ' if operand else ''}NULL")
+                else:
+                    raise ValueError(f"Unsupported operator {operator}")
+        if len(conditions) == 0:
+            return "1", params
+        return " AND ".join(conditions), params
+
+    def iterFlights(self, batchSize=5000, fields=None, query=None):
+        """
+        Stream the flights in batches without loading the whole table in memory
+        :param batchSize: number of flights in each batch
+        :param fields: a list containing the fields to return, None to return all of them
+        :param query: a dict containing the MongoDB filter of the flights, None to return all of them
+        :return: a generator of lists of flights
+        """
+        columns = "*"
+        if fields is not None:
+            selected = ["_id"] + [field for field in fields if field in FLIGHT_COLUMNS]
+            if any(field not in FLIGHT_COLUMNS and field != "_id" for field in fields):
+                selected.append("extra")
+            columns = ", ".join(selected)
+        condition, params = self.queryCondition({} if query is None else query)
+        lastId = ""
+        while True:
+            # keyset pagination on the _id, each batch is read with its own query
+            with self.lock:
+                rows = self.connection.execute(
+                    f"SELECT {columns} FROM flights WHERE {condition} AND _id > ? ORDER BY _id LIMIT ?",
+                    params + [lastId, batchSize]).fetchall()
+            if len(rows) == 0:
+                return
+            lastId = rows[-1]["_id"]
+            batch = [self.rowToFlight(row) for row in rows]
+            if fields is not None:
+                batch = [{key: value for key, value in flight.items() if key == "_id" or key in fields}
+                         for flight in batch]
+            yield batch
+
+    def countFlights(self) -> int:
+        """
+        :return: The number of flights in the database
+        """
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM flights").fetchone()[0]
+
+    def getAllIATA(self) -> list:
+        """
+        :return: All the iatas in the database
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT _id, acronym, name FROM iata").fetchall()
+        return [{"_id": ObjectId(row["_id"]), "acronym": row["acronym"], "name": row["name"]} for row in rows]
+
+    def updateFlight(self, element: dict) -> None:
+        """
+        Update a flight in the database using the _id as a filter
+        :param element: a flight
+        :return: None
+        """
+        row = self.flightToRow(element)
+        assignments = ", ".join(f"{column} = ?" for column in row)
+        with self.lock, self.connection:
+            self.connection.execute(f"UPDATE flights SET {assignments} WHERE _id = ?",
+                                    tuple(row.values()) + (str(element["_id"]),))
+        print(f"[*] Aggiornato {element['_id']}")
+
+    def bulkSetWeather(self, flights: list, batchSize=1000) -> dict:
+        """
+        Set the weather stats of the flights filtered on the _id, a transaction is committed for each batch,
+        flights having all the stats are no more pending
+        :param flights: a list of flights containing the _id and the weather stats to set
+        :param batchSize: maximum number of flights written in a single transaction
+        :return: a dict containing the number of matched, modified and failed flights
+        """
+        matched = 0
+        failed = 0
+        for start in range(0, len(flights), batchSize):
+            with self.lock, self.connection:
+                for flight in flights[start: start + batchSize]:
+                    values = {stat: flight[stat] for stat in WEATHER_STATS if stat in flight}
+                    if len(values) == 0:
+                        continue
+                    assignments = ", ".join(f"{stat} = ?" for stat in values)
+                    if len(values) == len(WEATHER_STATS):
+                        assignments += ", weatherPending = NULL"
+                    try:
+                        cursor = self.connection.execute(f"UPDATE flights SET {assignments} WHERE _id = ?",
+                                                         tuple(values.values()) + (str(flight["_id"]),))
+                        matched += cursor.rowcount
+                    except sqlite3.Error:
+                        failed += 1
+        return {"matched": matched, "modified": matched, "failed": failed}
+
+    def markPendingWeather(self) -> int:
+        """
+        Flag as pending the flights missing any weather stat
+        :return: the number of flights flagged
+        """
+        missing = " OR ".join(f"{stat} IS NULL" for stat in WEATHER_STATS)
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                f"UPDATE flights SET weatherPending = 1 WHERE ({missing}) AND weatherPending IS NULL "
+                "AND json_extract(extra, '$.weatherUnavailable') IS NULL")
+        return cursor.rowcount
+
+    def expirePendingWeather(self, before) -> int:
+        """
+        Move the pending flights scheduled before a moment to the terminal weatherUnavailable state,
+        they leave the pending index and are not requested anymore, the state is kept in the extra column
+        as the other fields without a column of their own
+        :param before: a datetime, the flights scheduled before it are no more pending
+        :return: the number of flights moved
+        """
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "UPDATE flights SET weatherPending = NULL, "
+                "extra = json_set(IFNULL(extra, '{}'), '$.weatherUnavailable', json('true')) "
+                "WHERE weatherPending IS NOT NULL AND scheduledDep < ?", (encodeValue(before),))
+        return cursor.rowcount
+
+    def getFlightsMissingWeather(self, since=None) -> list:
+        """
+        Returns the flights still waiting for the weather using the partial index on pending flights
+        :param since: a datetime, only flights scheduled from this moment are returned, None to return all of them
+        :return: a list containing the pending flights with only the fields used for the enrichment
+        """
+        query = {"weatherPending": {"$exists": True}}
+        if since is not None:
+            query["scheduledDep"] = {"$gte": since}
+        flights = []
+        for batch in self.iterFlights(fields=["airportDep", "scheduledDep", "actualDep"] + WEATHER_STATS, query=query):
+            flights += batch
+        return flights
+
+    def getMeta(self, name: str) -> dict:
+        """
+        Returns the state saved by a processing step
+        :param name: a string containing the name of the step
+        :return: a dict containing the state, empty if never saved
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT doc FROM meta WHERE _id = ?", (name,)).fetchone()
+        return {} if row is None else loadDocument(row["doc"])
+
+    def setMeta(self, name: str, values: dict) -> None:
+        """
+        Save the state of a processing step, the values not given are kept
+        :param name: a string containing the name of the step
+        :param values: a dict containing the values to save
+        :return: None
+        """
+        with self.lock, self.connection:
+            meta = self.getMeta(name)
+            meta.update(values)
+            meta["_id"] = name
+            self.connection.execute("INSERT OR REPLACE INTO meta (_id, doc) VALUES (?, ?)", (name, dumpDocument(meta)))
+
+    def getAllStats(self) -> list:
+        """
+        :return: All the aggregates in the stats table
+        """
+        with self.lock:
+            return [loadDocument(row["doc"]) for row in self.connection.execute("SELECT doc FROM stats")]
+
+    def getStats(self, ids: list, batchSize=500) -> list:
+        """
+        :param ids: a list containing the _id of the aggregates
+        :param batchSize: maximum number of _id in a single query
+        :return: the aggregates in the stats table having the given _id
+        """
+        docs = []
+        with self.lock:
+            for start in range(0, len(ids), batchSize):
+                batch = ids[start: start + batchSize]
+                query = f"SELECT doc FROM stats WHERE _id IN ({', '.join('?' * len(batch))})"
+                docs += [loadDocument(row["doc"]) for row in self.connection.execute(query, batch)]
+        return docs
+
+    def saveStats(self, docs: list) -> dict:
+        """
+        Replace the aggregates in the stats table whose revision did not change since they were read
+        :param docs: a list containing the aggregates with the revision they were read at
+        :return: a dict containing the number of written documents and the list of the _id not written
+        """
+        counts = {"written": 0, "conflicts": []}
+        with self.lock, self.connection:
+            for doc in docs:
+                revision = doc.get("revision", 0)
+                text = dumpDocument(dict(doc, revision=revision + 1))
+                # the documents saved before the revisions were added are at revision 0
+                cursor = self.connection.execute(
+                    "UPDATE stats SET doc = ? WHERE _id = ? AND IFNULL(json_extract(doc, '$.revision'), 0) = ?",
+                    (text, doc["_id"], revision))
+                if cursor.rowcount == 0 and revision == 0:
+                    cursor = self.connection.execute("INSERT OR IGNORE INTO stats (_id, doc) VALUES (?, ?)",
+                                                     (doc["_id"], text))
+                if cursor.rowcount > 0:
+                    counts["written"] += 1
+                else:
+                    counts["conflicts"].append(doc["_id"])
+        return counts
+
+    def clearStats(self) -> None:
+        """
+        Delete all the aggregates in the stats table
+        :return: None
+        """
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM stats")
+
+    def deleteFlight(self, element: dict) -> None:
+        """
+        Delete a flight in the database using the _id as a filter
+        :param element: a flight
+        :return: None
+        """
+        objId = element["_id"]["$oid"] if isinstance(element["_id"], dict) else str(element["_id"])
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM flights WHERE _id = ?", (objId,))
+
+    def getDistinctAirportArrNames(self) -> list:
+        """
+        :return: a list containing arrival airport names
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT DISTINCT airportArr FROM flights WHERE airportArr IS NOT NULL")
+            return [row[0] for row in rows]
+
+    def getDistinctAirportDepNames(self) -> list:
+        """
+        :return: a list containing departure airport names
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT DISTINCT airportDep FROM flights WHERE airportDep IS NOT NULL")
+            return [row[0] for row in rows]
+
+    def insertOneIATA(self, element: dict) -> None:
+        """
+        Insert a IATA in the database checking if it is already inserted
+        :param element: a IATA
+        :return: None
+        """
+        with self.lock, self.connection:
+            inserted = self.insertRow("iata", {"_id": str(ObjectId()), "acronym": element["acronym"],
+                                               "name": element["name"]}, True)
+        if inserted:
+            print(f"[+] Caricato {element['acronym']}")
+
+    def bulkUpsertIATA(self, iatas: list, batchSize=1000) -> dict:
+        """
+        Insert the IATAs not already in the database, a transaction is committed for each batch
+        :param iatas: a list of IATA objects
+        :param batchSize: maximum number of IATAs written in a single transaction
+        :return: a dict containing the number of inserted, matched and failed IATAs
+        """
+        inserted = 0
+        for start in range(0, len(iatas), batchSize):
+            with self.lock, self.connection:
+                for iata in iatas[start: start + batchSize]:
+                    inserted += self.insertRow("iata", {"_id": str(ObjectId()), "acronym": iata["acronym"],
+                                                        "name": iata["name"]}, True)
+        acronyms = len(set(iata["acronym"] for iata in iatas))
+        return {"inserted": inserted, "matched": acronyms - inserted, "failed": 0}
+
+    def airportReport(self) -> list:
+        """
+        QUERY returning in a single pass, for each airport, the number of flights, the means of wind speed,
+        precipitation and delays and the mean of the delays of the flights above and below the airport means,
+        the delays are counted in minute boundaries as $dateDiff does
+        :return: a list containing the query response
+        """
+        with self.lock:
+            return [dict(row) for row in self.connection.execute(AIRPORT_REPORT_QUERY)]
@@ -0,0 +1,499 @@
+import math
+from datetime import datetime
+
+from storage import FlightStorage, isNumber, toUtc
+
+# stats whose airport mean splits the flights in the report, with the suffix of the report keys
+SPLIT_STATS = {"wind_speed_100m": "Wind", "precipitation": "Prec"}
+
+# width of the histogram bins used to find out if a drift of the mean moved some flights across it
+BIN_WIDTHS = {"wind_speed_100m": 0.01, "precipitation": 0.01}
+
+STATS_VERSION = 1
+
+
+class RunningStat:
+    """
+    Count, mean and sum of squared differences from the mean of a series of values updated one value at a time
+    with the Welford algorithm, two of them can be merged without the original values
+    """
+
+    def __init__(self, n=0, mean=0.0, m2=0.0):
+        """
+        :param n: number of values
+        :param mean: mean of the values
+        :param m2: sum of the squared differences from the mean
+        """
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, value: float) -> None:
+        """
+        Add a value to the series
+        :param value: the value to add
+        :return: None
+        """
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other) -> None:
+        """
+        Add all the values of another series
+        :param other: a RunningStat object
+        :return: None
+        """
+        if other.n == 0:
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+
+    def getMean(self):
+        """
+        :return: the mean of the values, None without values as $avg does
+        """
+        return self.mean if self.n > 0 else None
+
+    def toDict(self) -> dict:
+        """
+        :return: a dict that can be saved in the database
+        """
+        return {"n": self.n, "mean": self.mean, "m2": self.m2}
+
+    @staticmethod
+    def fromDict(values: dict):
+        """
+        :param values: a dict returned by toDict
+        :return: a RunningStat object
+        """
+        return RunningStat(values["n"], values["mean"], values["m2"])
+
+
+def delayMinutes(flight: dict):
+    """
+    Delay of a flight counted as $dateDiff does, the number of minute boundaries between the departures
+    :param flight: a flight
+    :return: the delay in minutes, None if a departure is missing
+    """
+    if flight.get("scheduledDep") is None or flight.get("actualDep") is None:
+        return None
+    scheduled = toUtc(flight["scheduledDep"]).replace(second=0, microsecond=0)
+    actual = toUtc(flight["actualDep"]).replace(second=0, microsecond=0)
+    return (actual - scheduled).total_seconds() // 60
+
+
+def binKey(stat: str, value: float) -> str:
+    """
+    :param stat: a string containing the name of the stat
+    :param value: a value of the stat
+    :return: a string containing the histogram bin of the value
+    """
+    return str(math.floor(value / BIN_WIDTHS[stat]))
+
+
+def emptyDay() -> dict:
+    """
+    :return: a dict containing the aggregates of a day without flights
+    """
+    return {
+        "count": 0,
+        "delay": RunningStat(),
+        "stats": {stat: RunningStat() for stat in SPLIT_STATS},
+        "hist": {stat: {} for stat in SPLIT_STATS},
+    }
+
+
+def mergeDay(dayStats: dict, other: dict) -> None:
+    """
+    Add the aggregates of other flights to the aggregates of a day
+    :param dayStats: a dict returned by emptyDay
+    :param other: a dict returned by emptyDay
+    :return: None
+    """
+    dayStats["count"] += other["count"]
+    dayStats["delay"].merge(other["delay"])
+    for stat in SPLIT_STATS:
+        dayStats["stats"][stat].merge(other["stats"][stat])
+        for key, count in other["hist"][stat].items():
+            dayStats["hist"][stat][key] = dayStats["hist"][stat].get(key, 0) + count
+
+
+def dayFromDict(doc: dict) -> dict:
+    """
+    :param doc: a dict containing the aggregates of a day saved in the database
+    :return: a dict containing the aggregates with RunningStat objects
+    """
+    return {
+        "count": doc["count"],
+        "delay": RunningStat.fromDict(doc["delay"]),
+        "stats": {stat: RunningStat.fromDict(doc["stats"][stat]) for stat in SPLIT_STATS},
+        "hist": {stat: dict(doc["hist"][stat]) for stat in SPLIT_STATS},
+    }
+
+
+def emptySides() -> dict:
+    """
+    :return: a dict containing the sides of a split without flights
+    """
+    return {"gt": {"count": 0, "delay": RunningStat()}, "lte": {"count": 0, "delay": RunningStat()}}
+
+
+def mergeSides(split: dict, other: dict) -> None:
+    """
+    Add the flights of other sides split on the same mean to the sides of a split
+    :param split: a dict containing a split
+    :param other: a dict returned by emptySides
+    :return: None
+    """
+    for side in ["gt", "lte"]:
+        split[side]["count"] += other[side]["count"]
+        split[side]["delay"].merge(other[side]["delay"])
+
+
+class StatsStore:
+    """
+    Running aggregates of the report measures for each airport and day kept in the stats collection,
+    they are updated with the flights inserted and enriched, so the report is computed without reading the flights.
+    The delays above and below the airport means are kept for the mean they were split on: when the mean
+    drifts, the histograms of the values tell if some flight is now on the other side and only then
+    the split of that airport is recomputed from its flights.
+    Each store keeps apart the aggregates added since its last save and merges them in the documents read again
+    when saving, every document is written only if nobody changed it in the meantime, so more processes can
+    update the same aggregates
+    """
+
+    def __init__(self, conn: FlightStorage):
+        """
+        Load the aggregates saved in the database
+        :param conn: connection object
+        """
+        self.conn = conn
+        self.days = {}
+        self.splits = {}
+        self.revisions = {}
+        self.dayDeltas = {}
+        self.splitDeltas = {}
+        self.replacedSplits = {}
+        self.load()
+
+    def load(self) -> None:
+        """
+        Read again the aggregates saved in the database, the ones added and not saved yet are kept
+        :return: None
+        """
+        self.days = {}
+        self.splits = {}
+        self.revisions = {}
+        # the splits recomputed here are no more based on the documents read
+        self.replacedSplits = {}
+        for doc in self.conn.getAllStats():
+            self.revisions[doc["_id"]] = doc.get("revision", 0)
+            if doc["type"] == "day":
+                self.days[(doc["airport"], doc["day"])] = dayFromDict(doc)
+            elif doc["type"] == "split":
+                self.splits[doc["airport"]] = {stat: self.splitFromDict(doc["stats"][stat])
+                                               for stat in SPLIT_STATS if stat in doc["stats"]}
+
+    def isBuilt(self) -> bool:
+        """
+        :return: true if the aggregates were built from the flights in the database
+        """
+        return self.conn.getMeta("statsStore").get("version") == STATS_VERSION
+
+    def getDay(self, airport: str, day: str) -> dict:
+        """
+        Returns the aggregates of an airport in a day added since the last save, creating them if needed
+        :param airport: a string containing the departure airport
+        :param day: a string containing the date in the format YYYY-MM-DD
+        :return: a dict containing flights count, delays, stats and histograms
+        """
+        key = (airport, day)
+        if key not in self.dayDeltas:
+            self.dayDeltas[key] = emptyDay()
+        return self.dayDeltas[key]
+
+    def addStat(self, airport: str, dayStats: dict, stat: str, value: float, delay) -> None:
+        """
+        Add the value of a stat of a flight to the aggregates of its day and to the split of its airport
+        :param airport: a string containing the departure airport
+        :param dayStats: a dict returned by getDay
+        :param stat: a string containing the name of the stat
+        :param value: the value of the stat
+        :param delay: the delay of the flight, None if unknown
+        :return: None
+        """
+        dayStats["stats"][stat].add(value)
+        key = binKey(stat, value)
+        dayStats["hist"][stat][key] = dayStats["hist"][stat].get(key, 0) + 1
+
+        split = self.splits.get(airport, {}).get(stat)
+        if split is None:
+            return
+        if split["mean"] is None:
+            # the split is rebuilt the next time the report is requested
+            del self.splits[airport][stat]
+            self.replacedSplits.setdefault(airport, set()).add(stat)
+            self.splitDeltas.get(airport, {}).pop(stat, None)
+        else:
+            sides = self.splitDeltas.setdefault(airport, {}).setdefault(stat, emptySides())
+            side = sides["gt"] if value > split["mean"] else sides["lte"]
+            side["count"] += 1
+            if delay is not None:
+                side["delay"].add(delay)
+
+    def addFlights(self, flights: list) -> None:
+        """
+        Add the flights just inserted in the database
+        :param flights: a list of flights
+        :return: None
+        """
+        for flight in flights:
+            if flight.get("airportDep") is None or flight.get("scheduledDep") is None:
+                continue
+            airport = flight["airportDep"]
+            dayStats = self.getDay(airport, toUtc(flight["scheduledDep"]).strftime("%Y-%m-%d"))
+            delay = delayMinutes(flight)
+            dayStats["count"] += 1
+            if delay is not None:
+                dayStats["delay"].add(delay)
+            for stat in SPLIT_STATS:
+                if isNumber(flight.get(stat)):
+                    self.addStat(airport, dayStats, stat, flight[stat], delay)
+
+    def addWeather(self, flight: dict, values: dict) -> None:
+        """
+        Add the weather stats just set on a flight already in the aggregates
+        :param flight: a flight containing airport and departures
+        :param values: a dict containing the stats the flight did not have before
+        :return: None
+        """
+        if flight.get("airportDep") is None or flight.get("scheduledDep") is None:
+            return
+        airport = flight["airportDep"]
+        dayStats = self.getDay(airport, toUtc(flight["scheduledDep"]).strftime("%Y-%m-%d"))
+        delay = delayMinutes(flight)
+        for stat in SPLIT_STATS:
+            if isNumber(values.get(stat)):
+                self.addStat(airport, dayStats, stat, values[stat], delay)
+
+    def airportTotals(self) -> dict:
+        """
+        Merge the aggregates of the days of each airport, saved or not
+        :return: a dict having the airport as key and the merged aggregates as value
+        """
+        totals = {}
+        for days in [self.days, self.dayDeltas]:
+            for (airport, day), dayStats in days.items():
+                if airport not in totals:
+                    totals[airport] = emptyDay()
+                mergeDay(totals[airport], dayStats)
+        return totals
+
+    def getSplit(self, airport: str, stat: str):
+        """
+        :param airport: a string containing the departure airport
+        :param stat: a string containing the name of the stat
+        :return: a dict containing the split of the airport with the flights not saved yet, None if missing
+        """
+        split = self.splits.get(airport, {}).get(stat)
+        if split is None:
+            return None
+        split = self.splitFromDict(self.splitToDict(split))
+        if stat in self.splitDeltas.get(airport, {}):
+            mergeSides(split, self.splitDeltas[airport][stat])
+        return split
+
+    def isSplitValid(self, stat: str, split, mean, hist: dict) -> bool:
+        """
+        Check if every flight is still on the same side of the airport mean
+        :param stat: a string containing the name of the stat
+        :param split: a dict containing the split of the airport, None if missing
+        :param mean: the current mean of the stat in the airport
+        :param hist: a dict containing the histogram of the stat in the airport
+        :return: true if the split can be used as it is
+        """
+        if split is None or split["mean"] is None or mean is None:
+            return split is not None and split["mean"] == mean
+        if split["mean"] == mean:
+            return True
+        low = binKey(stat, min(split["mean"], mean))
+        high = binKey(stat, max(split["mean"], mean))
+        return all(hist.get(str(key), 0) == 0 for key in range(int(low), int(high) + 1))
+
+    def recomputeSplits(self, airport: str, means: dict, batchSize=5000) -> None:
+        """
+        Split again the delays of the flights of an airport on the current means
+        :param airport: a string containing the departure airport
+        :param means: a dict having the stat as key and the airport mean as value
+        :param batchSize: number of flights read in each batch
+        :return: None
+        """
+        splits = {stat: dict(emptySides(), mean=means[stat]) for stat in means}
+        fields = ["scheduledDep", "actualDep"] + list(means)
+        for batch in self.conn.iterFlights(batchSize, fields, {"airportDep": airport}):
+            for flight in batch:
+                delay = delayMinutes(flight)
+                for stat, split in splits.items():
+                    if split["mean"] is None or not isNumber(flight.get(stat)):
+                        continue
+                    side = split["gt"] if flight[stat] > split["mean"] else split["lte"]
+                    side["count"] += 1
+                    if delay is not None:
+                        side["delay"].add(delay)
+        self.splits.setdefault(airport, {}).update(splits)
+        self.replacedSplits.setdefault(airport, set()).update(splits)
+        for stat in splits:
+            self.splitDeltas.get(airport, {}).pop(stat, None)
+
+    def airportReport(self) -> list:
+        """
+        Compute the report of each airport from the aggregates, the rows are the same returned by
+        DBConnection.airportReport. The aggregates are saved and read again first, so the report contains
+        the flights added by the other processes too
+        :return: a list containing a dict for each airport
+        """
+        self.save()
+        self.load()
+        rows = []
+        for airport, total in self.airportTotals().items():
+            means = {stat: total["stats"][stat].getMean() for stat in SPLIT_STATS}
+            stale = {}
+            for stat in SPLIT_STATS:
+                split = self.getSplit(airport, stat)
+                if not self.isSplitValid(stat, split, means[stat], total["hist"][stat]):
+                    stale[stat] = means[stat]
+            if len(stale) > 0:
+                self.recomputeSplits(airport, stale)
+
+            row = {"airport": airport, "countFlights": total["count"], "meanDelays": total["delay"].getMean()}
+            for stat, suffix in SPLIT_STATS.items():
+                split = self.getSplit(airport, stat)
+                row["mean" + ("Precipitation" if suffix == "Prec" else suffix)] = means[stat]
+                row[f"mean{suffix}DelaysGt"] = split["gt"]["delay"].getMean()
+                row[f"count{suffix}Gt"] = split["gt"]["count"]
+                row[f"mean{suffix}DelaysLte"] = split["lte"]["delay"].getMean()
+                row[f"count{suffix}Lte"] = split["lte"]["count"]
+            rows.append(row)
+        self.save()
+        return rows
+
+    def splitFromDict(self, values: dict) -> dict:
+        """
+        :param values: a dict containing a split saved in the database
+        :return: a dict containing the split with RunningStat objects
+        """
+        return {"mean": values["mean"],
+                "gt": {"count": values["gt"]["count"], "delay": RunningStat.fromDict(values["gt"]["delay"])},
+                "lte": {"count": values["lte"]["count"], "delay": RunningStat.fromDict(values["lte"]["delay"])}}
+
+    def splitToDict(self, split: dict) -> dict:
+        """
+        :param split: a dict containing a split with RunningStat objects
+        :return: a dict that can be saved in the database
+        """
+        return {"mean": split["mean"],
+                "gt": {"count": split["gt"]["count"], "delay": split["gt"]["delay"].toDict()},
+                "lte": {"count": split["lte"]["count"], "delay": split["lte"]["delay"].toDict()}}
+
+    def mergeDayDoc(self, airport: str, day: str, doc) -> dict:
+        """
+        Add the aggregates of a day not saved yet to the ones in the database
+        :param airport: a string containing the departure airport
+        :param day: a string containing the date in the format YYYY-MM-DD
+        :param doc: a dict containing the aggregates of the day in the database, None if missing
+        :return: a dict containing the document to write
+        """
+        dayStats = dayFromDict(doc) if doc is not None else emptyDay()
+        mergeDay(dayStats, self.dayDeltas[(airport, day)])
+        return {"_id": f"day|{airport}|{day}", "type": "day", "airport": airport, "day": day,
+                "revision": doc.get("revision", 0) if doc is not None else 0,
+                "count": dayStats["count"], "delay": dayStats["delay"].toDict(),
+                "stats": {stat: dayStats["stats"][stat].toDict() for stat in SPLIT_STATS},
+                "hist": dayStats["hist"]}
+
+    def mergeSplitDoc(self, airport: str, doc) -> dict:
+        """
+        Add the changes of the splits of an airport not saved yet to the ones in the database. A split recomputed
+        here replaces the saved one only if nobody changed it since it was read and the flights added here are
+        added only to a split on the same mean, otherwise the split is left out and recomputed at the next report
+        :param airport: a string containing the departure airport
+        :param doc: a dict containing the splits of the airport in the database, None if missing
+        :return: a dict containing the document to write
+        """
+        docId = f"split|{airport}"
+        revision = doc.get("revision", 0) if doc is not None else 0
+        splits = {stat: self.splitFromDict(values) for stat, values in doc["stats"].items()} if doc is not None else {}
+        for stat in self.replacedSplits.get(airport, set()):
+            split = self.splits.get(airport, {}).get(stat)
+            if revision == self.revisions.get(docId, 0) and split is not None:
+                splits[stat] = self.splitFromDict(self.splitToDict(split))
+            else:
+                splits.pop(stat, None)
+        for stat, sides in self.splitDeltas.get(airport, {}).items():
+            split = self.splits.get(airport, {}).get(stat)
+            if stat in splits and split is not None and splits[stat]["mean"] == split["mean"]:
+                mergeSides(splits[stat], sides)
+            else:
+                splits.pop(stat, None)
+        return {"_id": docId, "type": "split", "airport": airport, "revision": revision,
+                "stats": {stat: self.splitToDict(split) for stat, split in splits.items()}}
+
+    def save(self, attempts=5) -> int:
+        """
+        Merge the aggregates changed since the last save in the ones in the database and write them,
+        the documents changed by another process in the meantime are read and merged again
+        :param attempts: maximum number of times a document is read and merged
+        :return: the number of documents written
+        """
+        written = 0
+        for _ in range(attempts):
+            dirtySplits = set(self.splitDeltas) | set(self.replacedSplits)
+            ids = [f"day|{airport}|{day}" for airport, day in self.dayDeltas] + \
+                  [f"split|{airport}" for airport in dirtySplits]
+            if len(ids) == 0:
+                break
+            saved = {doc["_id"]: doc for doc in self.conn.getStats(ids)}
+            docs = [self.mergeDayDoc(airport, day, saved.get(f"day|{airport}|{day}"))
+                    for airport, day in self.dayDeltas]
+            docs += [self.mergeSplitDoc(airport, saved.get(f"split|{airport}")) for airport in dirtySplits]
+
+            conflicts = set(self.conn.saveStats(docs)["conflicts"])
+            for doc in docs:
+                if doc["_id"] in conflicts:
+                    continue
+                written += 1
+                self.revisions[doc["_id"]] = doc["revision"] + 1
+                if doc["type"] == "day":
+                    key = (doc["airport"], doc["day"])
+                    self.days[key] = dayFromDict(doc)
+                    del self.dayDeltas[key]
+                else:
+                    self.splits[doc["airport"]] = {stat: self.splitFromDict(values)
+                                                   for stat, values in doc["stats"].items()}
+                    self.splitDeltas.pop(doc["airport"], None)
+                    self.replacedSplits.pop(doc["airport"], None)
+        return written
+
+    def rebuild(self, batchSize=5000) -> int:
+        """
+        Build the aggregates from scratch reading all the flights once
+        :param batchSize: number of flights read in each batch
+        :return: the number of flights read
+        """
+        self.conn.clearStats()
+        self.dayDeltas = {}
+        self.splitDeltas = {}
+        self.load()
+        fields = ["airportDep", "scheduledDep", "actualDep"] + list(SPLIT_STATS)
+        read = 0
+        for batch in self.conn.iterFlights(batchSize, fields):
+            self.addFlights(batch)
+            read += len(batch)
+        self.save()
+        self.conn.setMeta("statsStore", {"version": STATS_VERSION, "builtAt": datetime.now(), "flights": read})
+        return read
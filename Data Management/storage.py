@@ -0,0 +1,345 @@
+import math
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+
+# environment variable containing the storage to use when none is given
+STORAGE_URI_ENV = "FLIGHTS_STORAGE_URI"
+
+WEATHER_STATS = ["precipitation", "cloud_cover", "wind_speed_10m", "wind_speed_100m"]
+
+# per airport report over the flights table, the delays are counted in minute boundaries as $dateDiff does
+AIRPORT_REPORT_QUERY = """
+    WITH delays AS (
+        SELECT airportDep, wind_speed_100m, precipitation,
+            (CAST(strftime('%s', substr(actualDep, 1, 16)) AS INTEGER)
+             - CAST(strftime('%s', substr(scheduledDep, 1, 16)) AS INTEGER)) / 60 AS delays
+        FROM flights
+    ),
+    means AS (
+        SELECT *,
+            AVG(wind_speed_100m) OVER (PARTITION BY airportDep) AS meanWind,
+            AVG(precipitation) OVER (PARTITION BY airportDep) AS meanPrecipitation
+        FROM delays
+    )
+    SELECT airportDep AS airport,
+        COUNT(*) AS countFlights,
+        MAX(meanWind) AS meanWind,
+        AVG(delays) AS meanDelays,
+        AVG(CASE WHEN wind_speed_100m > meanWind THEN delays END) AS meanWindDelaysGt,
+        COUNT(CASE WHEN wind_speed_100m > meanWind THEN 1 END) AS countWindGt,
+        AVG(CASE WHEN wind_speed_100m <= meanWind THEN delays END) AS meanWindDelaysLte,
+        COUNT(CASE WHEN wind_speed_100m <= meanWind THEN 1 END) AS countWindLte,
+        MAX(meanPrecipitation) AS meanPrecipitation,
+        AVG(CASE WHEN precipitation > meanPrecipitation THEN delays END) AS meanPrecDelaysGt,
+        COUNT(CASE WHEN precipitation > meanPrecipitation THEN 1 END) AS countPrecGt,
+        AVG(CASE WHEN precipitation <= meanPrecipitation THEN delays END) AS meanPrecDelaysLte,
+        COUNT(CASE WHEN precipitation <= meanPrecipitation THEN 1 END) AS countPrecLte
+    FROM means
+    GROUP BY airportDep
+"""
+
+
+
+def toUtc(moment: datetime) -> datetime:
+    """
+    Convert a datetime to naive UTC, as MongoDB stores it
+    :param moment: a naive UTC or timezone aware datetime
+    :return: a naive datetime in UTC
+    """
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def isNumber(value) -> bool:
+    """
+    :param value: a value of a flight
+    :return: true if the value is a number as $isNumber checks, NaN is left out as SQLite stores it as NULL
+    """
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and not math.isnan(value)
+
+
+def reportFromFlights(batches) -> list:
+    """
+    Compute the airport report of flights read from a storage without the aggregation pipeline, the flights
+    are copied in a temporary SQLite table
+    :param batches: an iterable of lists of flights, as returned by iterFlights
+    :return: a list containing the report, with the same keys of airportReport
+    """
+    connection = sqlite3.connect(":memory:")
+    connection.row_factory = sqlite3.Row
+    connection.execute("CREATE TABLE flights (airportDep TEXT, scheduledDep TEXT, actualDep TEXT, "
+                       "wind_speed_100m REAL, precipitation REAL)")
+    for batch in batches:
+        rows = []
+        for flight in batch:
+            departures = [None if flight.get(field) is None else toUtc(flight[field]).strftime("%Y-%m-%d %H:%M:%S")
+                          for field in ["scheduledDep", "actualDep"]]
+            rows.append((flight.get("airportDep"), *departures,
+                         # non numeric values are left out as $avg does
+                         flight.get("wind_speed_100m") if isNumber(flight.get("wind_speed_100m")) else None,
+                         flight.get("precipitation") if isNumber(flight.get("precipitation")) else None))
+        connection.executemany("INSERT INTO flights VALUES (?, ?, ?, ?, ?)", rows)
+    report = [dict(row) for row in connection.execute(AIRPORT_REPORT_QUERY)]
+    connection.close()
+    return report
+
+
+class FlightStorage(ABC):
+    """
+    Methods shared by the storage backends, every backend implements the same insert, dedup, update,
+    query and aggregation methods of DBConnection so they can be used interchangeably,
+    a backend missing one of them can not be created
+    """
+
+    @abstractmethod
+    def bulkUpsertFlights(self, flights: list, batchSize=1000) -> dict:
+        """
+        Insert the flights not already in the database
+        :param flights: a list of flights
+        :param batchSize: maximum number of flights written at once
+        :return: a dict containing the number of inserted, matched and failed flights
+        and the list of the flights inserted
+        """
+
+    @abstractmethod
+    def updateFlight(self, element: dict) -> None:
+        """
+        Update a flight in the database using the _id as a filter
+        :param element: a flight
+        :return: None
+        """
+
+    @abstractmethod
+    def bulkSetWeather(self, flights: list, batchSize=1000) -> dict:
+        """
+        Set the weather stats of the flights filtered on the _id, flights having all the stats are no more pending
+        :param flights: a list of flights containing the _id and the weather stats to set
+        :param batchSize: maximum number of flights written at once
+        :return: a dict containing the number of matched, modified and failed flights
+        """
+
+    @abstractmethod
+    def markPendingWeather(self) -> int:
+        """
+        Flag as pending the flights missing any weather stat
+        :return: the number of flights flagged
+        """
+
+    @abstractmethod
+    def expirePendingWeather(self, before) -> int:
+        """
+        Move the pending flights scheduled before a moment to the terminal weatherUnavailable state,
+        they leave the pending index and are not requested anymore
+        :param before: a datetime, the flights scheduled before it are no more pending
+        :return: the number of flights moved
+        """
+
+    @abstractmethod
+    def iterFlights(self, batchSize=5000, fields=None, query=None):
+        """
+        Stream the flights in batches
+        :param batchSize: number of flights in each batch
+        :param fields: a list containing the fields to return, None to return all of them
+        :param query: a dict containing the MongoDB filter of the flights, None to return all of them
+        :return: a generator of lists of flights
+        """
+
+    @abstractmethod
+    def countFlights(self) -> int:
+        """
+        :return: The number of flights in the database
+        """
+
+    @abstractmethod
+    def getFlightsMissingWeather(self, since=None) -> list:
+        """
+        Returns the flights still waiting for the weather
+        :param since: a datetime, only flights scheduled from this moment are returned, None to return all of them
+        :return: a list containing the pending flights with only the fields used for the enrichment
+        """
+
+    @abstractmethod
+    def getDistinctAirportDepNames(self) -> list:
+        """
+        :return: a list containing departure airport names
+        """
+
+    @abstractmethod
+    def getAllIATA(self) -> list:
+        """
+        :return: All the iatas in the database
+        """
+
+    @abstractmethod
+    def bulkUpsertIATA(self, iatas: list, batchSize=1000) -> dict:
+        """
+        Insert the IATAs not already in the database
+        :param iatas: a list of IATA objects
+        :param batchSize: maximum number of IATAs written at once
+        :return: a dict containing the number of inserted, matched and failed IATAs
+        """
+
+    @abstractmethod
+    def getMeta(self, name: str) -> dict:
+        """
+        Returns the state saved by a processing step
+        :param name: a string containing the name of the step
+        :return: a dict containing the state, empty if never saved
+        """
+
+    @abstractmethod
+    def setMeta(self, name: str, values: dict) -> None:
+        """
+        Save the state of a processing step, the values not given are kept
+        :param name: a string containing the name of the step
+        :param values: a dict containing the values to save
+        :return: None
+        """
+
+    @abstractmethod
+    def getAllStats(self) -> list:
+        """
+        :return: All the running aggregates
+        """
+
+    @abstractmethod
+    def getStats(self, ids: list) -> list:
+        """
+        :param ids: a list containing the _id of the aggregates
+        :return: the running aggregates having the given _id
+        """
+
+    @abstractmethod
+    def saveStats(self, docs: list) -> dict:
+        """
+        Replace the running aggregates keyed on the _id, a document is written with its revision increased by one
+        only if the revision in the database is still the one it contains, 0 for the documents not saved yet
+        :param docs: a list containing the aggregates
+        :return: a dict containing the number of written documents and the list of the _id not written
+        """
+
+    @abstractmethod
+    def clearStats(self) -> None:
+        """
+        Delete all the running aggregates
+        :return: None
+        """
+
+    def getFlightKey(self, element: dict) -> dict:
+        """
+        Returns the parameters identifying a flight
+        :param element: a flight
+        :return: a dict containing only the parameters used to recognize duplicated flights
+        """
+        return {
+            "scheduledDep": element["scheduledDep"],
+            "actualDep": element["actualDep"],
+            "airportDep": element["airportDep"],
+            "airportArr": element["airportArr"],
+        }
+
+    @abstractmethod
+    def airportReport(self) -> list:
+        """
+        QUERY returning in a single pass, for each airport, the number of flights, the means of wind speed,
+        precipitation and delays and the mean of the delays of the flights above and below the airport means
+        :return: a list containing the query response
+        """
+
+    def reportQuery(self, key: str, name: str, countKey=None, rows=None) -> list:
+        """
+        Extract a single measure from the airport report in the format of the single queries
+        :param key: a string containing the measure in the report
+        :param name: a string containing the name of the measure in the response
+        :param countKey: a string containing the counter of the flights used for the measure, airports
+        without flights are left out as the single queries filter on them
+        :param rows: a list containing an airport report already computed, as the one of the stats store,
+        None to compute it
+        :return: a list containing the query response
+        """
+        if rows is None:
+            rows = self.airportReport()
+        return [{"airport": row["airport"], name: row[key]} for row in rows
+                if countKey is None or row[countKey] > 0]
+
+    def flightsGroupedByAirport(self) -> list:
+        """
+        QUERY returning number of flights for each airport
+        :return: a list containing the query response
+        """
+        return self.reportQuery("countFlights", "count")
+
+    def meanWindSpeed100mGroupedByAirport(self) -> list:
+        """
+        QUERY returning mean of wind speed for each airport
+        :return: a list containing the query response
+        """
+        return self.reportQuery("meanWind", "mean")
+
+    def meanDelaysGroupedByAirport(self) -> list:
+        """
+        QUERY returning mean of delays for each airport
+        :return: a list containing the query response
+        """
+        return self.reportQuery("meanDelays", "avgDelays")
+
+    def meanDelaysGroupedByAirportFilteredOnWind100mGt(self) -> list:
+        """
+        QUERY returning mean of delays for each airport filtering only wind speed 100m > airport mean
+        :return: a list containing the query response
+        """
+        return self.reportQuery("meanWindDelaysGt", "avgDelays", "countWindGt")
+
+    def meanDelaysGroupedByAirportFilteredOnWind100mLt(self) -> list:
+        """
+        QUERY returning mean of delays for each airport filtering only wind speed 100m <= airport mean
+        :return: a list containing the query response
+        """
+        return self.reportQuery("meanWindDelaysLte", "avgDelays", "countWindLte")
+
+    def meanPrecipitationGroupedByAirport(self) -> list:
+        """
+        QUERY returning mean of precipitation for each airport
+        :return: a list containing the query response
+        """
+        return self.reportQuery("meanPrecipitation", "mean")
+
+    def meanDelaysGroupedByAirportFilteredOnPrecipitationGt(self) -> list:
+        """
+        QUERY returning mean of delays for each airport filtering only precipitation > airport mean
+        :return: a list containing the query response
+        """
+        return self.reportQuery("meanPrecDelaysGt", "avgDelays", "countPrecGt")
+
+    def meanDelaysGroupedByAirportFilteredOnPrecipitationLt(self) -> list:
+        """
+        QUERY returning mean of delays for each airport filtering only precipitation <= airport mean
+        :return: a list containing the query response
+        """
+        return self.reportQuery("meanPrecDelaysLte", "avgDelays", "countPrecLte")
+
+
+def openStorage(uri=None) -> FlightStorage:
+    """
+    Open the storage identified by the uri: sqlite:///path for the embedded SQLite file, mongomock:// for
+    an in-process MongoDB, any other uri for a MongoDB server and None for the configured one or the cluster,
+    mongomock has no window functions so its airport report is computed streaming the flights into SQLite
+    :param uri: a string identifying the storage, None to read it from the environment
+    :return: a storage object
+    """
+    if uri is None:
+        uri = os.environ.get(STORAGE_URI_ENV)
+
+    if uri is not None and uri.startswith("sqlite:///"):
+        from sqliteConnection import SQLiteConnection
+        return SQLiteConnection(uri[len("sqlite:///"):])
+
+    from DBConnection import DBConnection
+    if uri == "mongomock://":
+        # only needed to run without a MongoDB server
+        import mongomock
+        return DBConnection(client=mongomock.MongoClient())
+    return DBConnection(uri)
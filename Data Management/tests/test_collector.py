@@ -0,0 +1,9 @@
+import pytest
+
+from collector import runCollector
+from storage import openStorage
+
+
+def test_collector_without_airports_is_not_started():
+    with pytest.raises(ValueError):
+        runCollector(openStorage("sqlite:///:memory:"), airports={}, maxCycles=1)
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from correlations import correlationStats, pearsonFromStats, poolCorrelationStats
+
+MEASURES = ["noise", "linear", "constant", "offset", "sparse"]
+
+
+def randomFlights(size: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    delay = rng.normal(20, 15, size)
+    dataframe = pd.DataFrame({
+        "airportDep": rng.choice(["MXP", "NRT", "BOG", None], size),
+        "delay": delay,
+        "noise": rng.normal(5, 2, size),
+        "linear": 3 * delay + rng.normal(0, 1, size),
+        # a constant non-zero value, its mean is not exactly representable
+        "constant": np.full(size, 0.1),
+        # a small correlated signal on a large offset, lost by the sums of squares
+        "offset": 1e9 + delay / 10 + rng.normal(0, 1, size),
+        "sparse": np.where(rng.random(size) < 0.7, np.nan, rng.normal(0, 1, size)),
+    })
+    dataframe.loc[rng.random(size) < 0.1, "delay"] = np.nan
+    return dataframe
+
+
+def expectedCorrelations(dataframe: pd.DataFrame) -> pd.Series:
+    return dataframe[["delay"] + MEASURES].corr()["delay"][MEASURES]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_pearson_matches_dataframe_corr(seed):
+    dataframe = randomFlights(2000, seed)
+    stats = correlationStats(dataframe, measures=MEASURES)
+
+    coefficients = pearsonFromStats(stats)
+    for airport, group in dataframe.groupby("airportDep"):
+        for measure, expected in expectedCorrelations(group).items():
+            assert coefficients[(airport, measure)] == pytest.approx(expected, abs=1e-6, nan_ok=True), \
+                (airport, measure)
+
+    general = pearsonFromStats(poolCorrelationStats(stats, "measure"))
+    for measure, expected in expectedCorrelations(dataframe.loc[dataframe["airportDep"].notna()]).items():
+        assert general[measure] == pytest.approx(expected, abs=1e-6, nan_ok=True), measure
+
+
+def test_constant_values_have_no_coefficient():
+    dataframe = randomFlights(500, 0)
+
+    coefficients = pearsonFromStats(correlationStats(dataframe, measures=MEASURES))
+
+    assert coefficients.xs("constant", level="measure").isna().all()
+
+
+def test_statistics_of_two_dataframes_are_merged():
+    dataframe = randomFlights(2000, 1)
+    left, right = dataframe.iloc[:700], dataframe.iloc[700:]
+
+    merged = poolCorrelationStats(pd.concat([correlationStats(left, measures=MEASURES),
+                                             correlationStats(right, measures=MEASURES)]), ["airport", "measure"])
+
+    expected = correlationStats(dataframe, measures=MEASURES)
+    pd.testing.assert_series_equal(pearsonFromStats(merged).sort_index(), pearsonFromStats(expected).sort_index(),
+                                   atol=1e-6)
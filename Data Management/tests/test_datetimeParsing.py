@@ -0,0 +1,121 @@
+import random
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+import pytz
+
+from datetimeParsing import localize, localizeDatetime, localizeMany
+
+TIMEZONES = ["Europe/Rome", "Asia/Tokyo", "Atlantic/Reykjavik", "America/Bogota", "America/New_York", "Asia/Manila",
+             "Europe/Athens", "Australia/Lord_Howe", "Pacific/Chatham", "UTC"]
+
+
+def strptimeDatetime(date: str, time: str, timezone: str) -> datetime:
+    # the parsing of localizeDatetime before the cached timezones and the binary search of the offsets
+    tz = pytz.timezone(timezone)
+    return tz.localize(datetime.strptime(date + " " + time, '%Y-%m-%d %H:%M'))
+
+
+def assertSameMoment(result: datetime, expected: datetime) -> None:
+    assert result == expected
+    assert result.utcoffset() == expected.utcoffset()
+    assert result.tzname() == expected.tzname()
+
+
+def randomField(rng: random.Random, value: int) -> str:
+    # strptime accepts the fields with or without the leading zero
+    return str(value) if rng.random() < 0.3 else f"{value:02d}"
+
+
+def transitionTimes(timezone: str) -> list:
+    # local wall clock times around each change of offset, skipped and repeated ones included
+    tz = pytz.timezone(timezone)
+    moments = []
+    for index, transition in enumerate(getattr(tz, "_utc_transition_times", [])[1:], start=1):
+        if not 1970 <= transition.year <= 2037:
+            continue
+        offset = tz._transition_info[index - 1][0]
+        local = (transition + offset).replace(second=0)
+        for minutes in range(-90, 91, 15):
+            moments.append(local + timedelta(minutes=minutes))
+    return moments
+
+
+@pytest.mark.parametrize("timezone", TIMEZONES)
+def test_localizeDatetime_matches_pytz_localize(timezone):
+    rng = random.Random(timezone)
+    for _ in range(2000):
+        moment = datetime(rng.randint(1950, 2050), rng.randint(1, 12), rng.randint(1, 28), rng.randint(0, 23),
+                          rng.randint(0, 59))
+        date = f"{moment.year}-{randomField(rng, moment.month)}-{randomField(rng, moment.day)}"
+        time = f"{randomField(rng, moment.hour)}:{randomField(rng, moment.minute)}"
+        assertSameMoment(localizeDatetime(date, time, timezone), strptimeDatetime(date, time, timezone))
+
+
+@pytest.mark.parametrize("timezone", TIMEZONES)
+def test_localizeDatetime_matches_pytz_localize_around_the_transitions(timezone):
+    for moment in transitionTimes(timezone):
+        date = moment.strftime("%Y-%m-%d")
+        time = moment.strftime("%H:%M")
+        assertSameMoment(localizeDatetime(date, time, timezone), strptimeDatetime(date, time, timezone))
+
+
+@pytest.mark.parametrize("date, time", [
+    ("2024-03-31", "02:30"),  # skipped when the clocks go forward
+    ("2024-10-27", "02:30"),  # repeated when the clocks go back
+])
+def test_localizeDatetime_keeps_the_standard_offset_at_the_transitions(date, time):
+    result = localizeDatetime(date, time, "Europe/Rome")
+
+    assertSameMoment(result, strptimeDatetime(date, time, "Europe/Rome"))
+    assert result.utcoffset() == timedelta(hours=1)
+
+
+@pytest.mark.parametrize("date, time", [("2024-1-1", "1:5"), ("２０２４-01-01", "10:00")])
+def test_localizeDatetime_parses_the_unusual_strings_as_strptime(date, time):
+    assertSameMoment(localizeDatetime(date, time, "Europe/Rome"), strptimeDatetime(date, time, "Europe/Rome"))
+
+
+@pytest.mark.parametrize("date, time", [
+    ("2024-13-01", "10:00"), ("2024-02-30", "10:00"), ("2024-01-01", "24:00"), ("24-01-01", "10:00"),
+    ("2024-001-01", "10:00"), ("2024-01-01", "10:00:00"), ("2024-01-01", ""),
+    ("2024-01-01", "１０:00"),
+])
+def test_localizeDatetime_rejects_the_strings_rejected_by_strptime(date, time):
+    with pytest.raises(ValueError):
+        strptimeDatetime(date, time, "Europe/Rome")
+    with pytest.raises(ValueError):
+        localizeDatetime(date, time, "Europe/Rome")
+
+
+@pytest.mark.parametrize("timezone", ["Europe/Rome", "America/New_York", "Australia/Lord_Howe"])
+def test_localizeMany_matches_localizeDatetime(timezone):
+    rng = random.Random(timezone)
+    moments = transitionTimes(timezone)
+    moments = rng.sample(moments, min(len(moments), 500))
+    dates = [moment.strftime("%Y-%m-%d") for moment in moments] + ["2024-13-01", None]
+    times = [moment.strftime("%H:%M") for moment in moments] + ["10:00", "10:00"]
+
+    localized = localizeMany(dates, times, timezone)
+
+    for i, (date, time) in enumerate(zip(dates[:-2], times[:-2])):
+        assert localized[i] == pd.Timestamp(localizeDatetime(date, time, timezone)).tz_convert("UTC")
+    assert localized[len(dates) - 2] is pd.NaT
+    assert localized[len(dates) - 1] is pd.NaT
+
+
+class PublicTimezone:
+    # a timezone exposing only the public interface of pytz, without the transitions
+    def __init__(self, timezone: str):
+        self.tz = pytz.timezone(timezone)
+
+    def localize(self, naive: datetime, is_dst=False) -> datetime:
+        return self.tz.localize(naive, is_dst=is_dst)
+
+
+def test_timezones_without_the_transitions_are_localized_by_pytz():
+    naive = datetime(2024, 7, 1, 10, 30)
+
+    assertSameMoment(localize(PublicTimezone("Europe/Rome"), naive),
+                     pytz.timezone("Europe/Rome").localize(naive, is_dst=False))
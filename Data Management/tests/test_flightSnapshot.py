@@ -0,0 +1,121 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import mongomock
+import pandas as pd
+from bson import ObjectId
+
+from DBConnection import DBConnection
+from flightSnapshot import loadSnapshot, readState, refreshSnapshot
+from storage import openStorage
+from test_storage import randomFlights
+from utils import flightsCursorToDataframe
+
+
+def snapshotMatches(conn, path) -> bool:
+    expected = flightsCursorToDataframe(conn)
+    snapshot = loadSnapshot(path)
+    if sorted(snapshot["_id"].astype(str)) != sorted(expected["_id"].astype(str)):
+        return False
+    expected = expected.set_index(expected["_id"].astype(str)).sort_index()
+    snapshot = snapshot.set_index(snapshot["_id"].astype(str)).sort_index()
+    for column in ["wind_speed_100m", "precipitation", "delay"]:
+        if not expected[column].astype(float).equals(snapshot[column].astype(float)):
+            return False
+    return True
+
+
+def test_refresh_exports_the_new_flights(tmp_path):
+    conn = openStorage("sqlite:///:memory:")
+    flights = randomFlights(300)
+    conn.bulkUpsertFlights(flights[:200])
+    path = str(tmp_path / "snapshot")
+
+    assert refreshSnapshot(conn, path, batchSize=50) == 200
+    conn.bulkUpsertFlights(flights[200:])
+    refreshSnapshot(conn, path, batchSize=50)
+
+    assert snapshotMatches(conn, path)
+
+
+def test_flights_receiving_the_weather_are_exported_again(tmp_path):
+    conn = openStorage("sqlite:///:memory:")
+    conn.bulkUpsertFlights(randomFlights(100))
+    path = str(tmp_path / "snapshot")
+    refreshSnapshot(conn, path, lag=timedelta(0))
+    pending = conn.getFlightsMissingWeather()
+    assert len(readState(path)["pending"]) == len(pending) > 0
+
+    conn.bulkSetWeather([{"_id": flight["_id"], "precipitation": 1.0, "cloud_cover": 10.0, "wind_speed_10m": 5.0,
+                          "wind_speed_100m": 9.0} for flight in pending])
+    assert refreshSnapshot(conn, path, lag=timedelta(0)) >= len(pending)
+
+    assert readState(path)["pending"] == []
+    assert snapshotMatches(conn, path)
+
+
+def test_expired_flights_are_exported_with_their_partial_weather(tmp_path):
+    conn = openStorage("sqlite:///:memory:")
+    conn.bulkUpsertFlights(randomFlights(100))
+    path = str(tmp_path / "snapshot")
+    refreshSnapshot(conn, path)
+    pending = conn.getFlightsMissingWeather()
+    conn.bulkSetWeather([{"_id": flight["_id"], "precipitation": 0.5} for flight in pending])
+
+    conn.expirePendingWeather(datetime(2100, 1, 1))
+    refreshSnapshot(conn, path)
+
+    assert readState(path)["pending"] == []
+    assert snapshotMatches(conn, path)
+
+
+def test_pending_flights_out_of_the_retry_window_are_dropped(tmp_path):
+    conn = DBConnection(client=mongomock.MongoClient())
+    now = datetime.now(timezone.utc)
+    flights = randomFlights(2)
+    for flight, days in zip(flights, [40, 1]):
+        flight["_id"] = ObjectId.from_datetime(now - timedelta(days=days))
+        flight["weatherPending"] = True
+    conn.itemColl.insert_many(flights)
+    path = str(tmp_path / "snapshot")
+
+    refreshSnapshot(conn, path, retryDays=30)
+
+    assert readState(path)["pending"] == [str(flights[1]["_id"])]
+
+
+def test_flights_committed_after_a_later_one_are_not_lost(tmp_path):
+    client = mongomock.MongoClient()
+    conn = DBConnection(client=client)
+    now = datetime.now(timezone.utc)
+    flights = randomFlights(3)
+    for i, flight in enumerate(flights):
+        flight["_id"] = ObjectId.from_datetime(now - timedelta(minutes=3 - i))
+    # the last flight is exported before the second one is committed
+    conn.itemColl.insert_many([flights[0], flights[2]])
+    path = str(tmp_path / "snapshot")
+    refreshSnapshot(conn, path)
+
+    conn.itemColl.insert_one(flights[1])
+    refreshSnapshot(conn, path)
+
+    assert sorted(loadSnapshot(path)["_id"]) == sorted(str(flight["_id"]) for flight in flights)
+
+
+def test_compaction_keeps_one_version_of_each_flight(tmp_path):
+    conn = openStorage("sqlite:///:memory:")
+    conn.bulkUpsertFlights(randomFlights(200))
+    path = str(tmp_path / "snapshot")
+    refreshSnapshot(conn, path, batchSize=30, compactParts=None)
+    before = loadSnapshot(path)
+
+    # the trailing window exports the flights again, then the snapshot is compacted
+    refreshSnapshot(conn, path, batchSize=30, compactParts=2)
+
+    assert readState(path)["parts"] == 1
+    files = [name for _, _, names in os.walk(path) for name in names if name.endswith(".parquet")]
+    assert all(name.startswith("part-000001-") for name in files)
+    after = pd.read_parquet(path)
+    assert after["_id"].is_unique
+    pd.testing.assert_frame_equal(loadSnapshot(path).sort_index(), before.sort_index())
+    assert snapshotMatches(conn, path)
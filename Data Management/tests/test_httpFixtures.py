@@ -0,0 +1,31 @@
+import os
+
+import pytest
+import requests
+
+import httpClient
+from airportRegistry import getAirports
+from collector import collectFlights, loadMatcher
+from httpFixtures import FIXTURES_IATA_PATH, FIXTURES_PATH, useFixtures
+from storage import openStorage
+
+# the fixtures are resolved from the directory of the modules, as main.py is run from there
+PROJECT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def replay(monkeypatch):
+    monkeypatch.setattr(httpClient, "session", requests.Session())
+    useFixtures("replay", os.path.join(PROJECT_PATH, FIXTURES_PATH))
+
+
+def test_pinned_fixtures_give_flights_for_every_airport(replay):
+    conn = openStorage("sqlite:///:memory:")
+    matcher, _ = loadMatcher(conn, (None, os.path.join(PROJECT_PATH, FIXTURES_IATA_PATH)))
+
+    metrics = collectFlights(conn, getAirports(), matcher)
+
+    for name, airport in metrics["airports"].items():
+        assert airport["error"] is None, name
+        assert airport["inserted"] > 0, name
+    assert metrics["failed"] == 0
@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+from iataMatcher import IATAMatcher
+from utils import getMostSimilarIATA
+
+
+def randomName(rng: random.Random, maxLength: int) -> str:
+    # a small alphabet makes the names overlap and contain each other
+    return "".join(rng.choice("abc ") for _ in range(rng.randint(0, maxLength)))
+
+
+def randomIATAs(rng: random.Random, size: int) -> list:
+    iatas = []
+    for i in range(size):
+        name = randomName(rng, 5)
+        if rng.random() < 0.2:
+            name += ", " + randomName(rng, 4)
+        if rng.random() < 0.3:
+            name = name.upper()
+        iatas.append({"acronym": f"A{i:03d}", "name": name})
+    return iatas
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matcher_returns_the_acronym_of_getMostSimilarIATA(seed):
+    rng = random.Random(seed)
+    iatas = randomIATAs(rng, rng.randint(1, 60))
+    matcher = IATAMatcher(iatas, cacheSize=16)
+
+    airportNames = [randomName(rng, 12) for _ in range(300)] + [iata["name"] for iata in iatas]
+    rng.shuffle(airportNames)
+    for airportName in airportNames:
+        assert matcher.getMostSimilarIATA(airportName) == getMostSimilarIATA(iatas, airportName), airportName
+
+
+def test_matcher_returns_the_name_when_no_iata_is_found():
+    iatas = [{"acronym": "MXP", "name": "Milano Malpensa, Italy"}, {"acronym": "LIN", "name": "Milano Linate"}]
+    matcher = IATAMatcher(iatas)
+
+    for airportName in ["Milano Malpensa", "Aeroporto di Milano Linate", "Paris CDG", ""]:
+        assert matcher.getMostSimilarIATA(airportName) == getMostSimilarIATA(iatas, airportName)
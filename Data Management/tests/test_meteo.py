@@ -0,0 +1,83 @@
+import math
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from meteo import interpolateWeather
+from storage import WEATHER_STATS
+from utils import splitDatetime
+
+
+def loopInterpolation(scheduledDep: datetime, days: dict) -> dict:
+    # the interpolation of a single flight as addMeteoToFlights did it before interpolateWeather
+    date, schedDep = splitDatetime(scheduledDep)
+    hour = schedDep.split(":")[0] + ":00"
+    percentageHour = int(schedDep.split(":")[1]) / 60
+
+    statsObj = days[date]
+
+    index = -1
+    for i, time in enumerate(statsObj["hourly"]["time"]):
+        if hour in time:
+            index = i
+
+    values = {}
+    for stat in WEATHER_STATS:
+        if index < len(statsObj["hourly"][stat]) - 1:
+            left = statsObj["hourly"][stat][index]
+            right = statsObj["hourly"][stat][index + 1]
+            if left is not None and right is not None:
+                values[stat] = round(left * (1 - percentageHour) + right * percentageHour, 4)
+        elif statsObj["hourly"][stat][index] is not None:
+            values[stat] = statsObj["hourly"][stat][index]
+    return values
+
+
+def randomDays(rng: random.Random, dates: list) -> dict:
+    days = {}
+    for date in dates:
+        # the most recent days of the weather archive can end before midnight
+        hours = 24 if rng.random() < 0.7 else rng.randint(1, 23)
+        start = datetime.strptime(date, "%Y-%m-%d")
+        hourly = {"time": [(start + timedelta(hours=hour)).strftime("%Y-%m-%dT%H:%M") for hour in range(hours)]}
+        for stat in WEATHER_STATS:
+            hourly[stat] = [None if rng.random() < 0.1 else round(rng.uniform(0, 50), 1) for _ in range(hours)]
+        days[date] = {"latitude": 45.63, "longitude": 8.72, "hourly": hourly}
+    return days
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_interpolation_matches_the_per_flight_loop(seed):
+    rng = random.Random(seed)
+    first = datetime(2024, 3, 1) + timedelta(days=rng.randint(0, 300))
+    dates = [(first + timedelta(days=day)).strftime("%Y-%m-%d") for day in range(rng.randint(1, 10))]
+    days = randomDays(rng, dates)
+
+    scheduledDeps = []
+    for _ in range(500):
+        date = rng.choice(dates)
+        # the flights depart in the hours available for their day
+        hours = len(days[date]["hourly"]["time"])
+        scheduledDeps.append(datetime.strptime(date, "%Y-%m-%d")
+                             + timedelta(hours=rng.randrange(hours), minutes=rng.randint(0, 59)))
+    # the days are not sorted in the responses merged from the cache and the weather archive
+    shuffled = dict(rng.sample(list(days.items()), len(days)))
+
+    interpolated = interpolateWeather(scheduledDeps, shuffled)
+    for i, scheduledDep in enumerate(scheduledDeps):
+        expected = loopInterpolation(scheduledDep, days)
+        for stat in WEATHER_STATS:
+            value = interpolated[stat][i]
+            if stat in expected:
+                assert value == expected[stat], (scheduledDep, stat)
+            else:
+                assert math.isnan(value), (scheduledDep, stat)
+
+
+def test_days_without_weather_leave_the_flights_without_values():
+    days = {"2024-05-02": {"error": True, "reason": "Parameter start_date is out of allowed range"}}
+
+    interpolated = interpolateWeather([datetime(2024, 5, 2, 10, 30)], days)
+
+    assert all(math.isnan(interpolated[stat][0]) for stat in WEATHER_STATS)
@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+from statsStore import StatsStore
+from storage import WEATHER_STATS, openStorage
+from test_storage import randomFlights
+
+
+def newFlights(size: int, seed: int) -> list:
+    flights = randomFlights(size, seed)
+    for flight in flights:
+        flight["number"] = f"{seed}-{flight['number']}"
+    return flights
+
+
+def addWeather(conn, store, seed: int) -> None:
+    # some of the pending flights receive the stats they miss, as addMeteoToFlights does
+    rng = random.Random(seed)
+    enriched = []
+    for flight in conn.getFlightsMissingWeather():
+        if rng.random() < 0.5:
+            continue
+        added = {stat: round(rng.random() * 30, 2) for stat in WEATHER_STATS if flight.get(stat) is None}
+        flight.update(added)
+        enriched.append(flight)
+        store.addWeather(flight, added)
+    conn.bulkSetWeather(enriched)
+
+
+def assertSameReport(rows: list, expected: list) -> None:
+    rows = {row["airport"]: row for row in rows}
+    expected = {row["airport"]: row for row in expected}
+    assert rows.keys() == expected.keys()
+    for airport, row in rows.items():
+        assert row == pytest.approx(expected[airport], nan_ok=True), airport
+
+
+def test_store_matches_the_report_of_the_flights_over_the_rounds():
+    conn = openStorage("sqlite:///:memory:")
+    store = StatsStore(conn)
+    store.rebuild()
+
+    for seed in range(5):
+        inserted = conn.bulkUpsertFlights(newFlights(200, seed))["insertedFlights"]
+        store.addFlights(inserted)
+        addWeather(conn, store, seed)
+        store.save()
+
+        assertSameReport(store.airportReport(), conn.airportReport())
+
+
+@pytest.mark.parametrize("uri", ["mongomock://", "sqlite:///:memory:"])
+def test_two_writers_do_not_overwrite_their_counts(uri):
+    conn = openStorage(uri)
+    conn.bulkUpsertFlights(newFlights(200, 0))
+    first = StatsStore(conn)
+    first.rebuild()
+    # the splits are saved before the two writers load the aggregates
+    first.airportReport()
+    second = StatsStore(conn)
+
+    for seed, store in [(1, first), (2, second), (3, first)]:
+        store.addFlights(conn.bulkUpsertFlights(newFlights(100, seed))["insertedFlights"])
+        addWeather(conn, store, seed)
+    first.save()
+    second.save()
+
+    assertSameReport(StatsStore(conn).airportReport(), conn.airportReport())
+    assertSameReport(second.airportReport(), conn.airportReport())
+
+
+@pytest.mark.parametrize("uri", ["mongomock://", "sqlite:///:memory:"])
+def test_documents_changed_since_they_were_read_are_not_written(uri):
+    conn = openStorage(uri)
+    doc = {"_id": "day|MXP|2024-01-01", "type": "day", "count": 1, "revision": 0}
+
+    assert conn.saveStats([doc]) == {"written": 1, "conflicts": []}
+    # another writer read the document before the first save
+    assert conn.saveStats([dict(doc, count=2)]) == {"written": 0, "conflicts": [doc["_id"]]}
+    assert conn.saveStats([dict(doc, count=3, revision=1)])["written"] == 1
+
+    saved = conn.getStats([doc["_id"]])
+    assert [(saved[0]["count"], saved[0]["revision"])] == [(3, 2)]
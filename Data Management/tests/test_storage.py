@@ -0,0 +1,91 @@
+import random
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+
+from DBConnection import DBConnection
+from storage import FlightStorage, openStorage
+
+
+def test_flights_inserted_before_the_pending_index_are_flagged():
+    client = mongomock.MongoClient()
+    client["dbflights"]["collflights"].insert_one({
+        "number": "AZ1", "status": "departed", "scheduledDep": datetime(2024, 1, 1, 10),
+        "actualDep": datetime(2024, 1, 1, 10, 20), "airportDep": "MXP", "airportArr": "FCO",
+    })
+
+    conn = DBConnection(client=client)
+
+    assert conn.indexes["collflights"]["weatherPending"]["status"] == "created"
+    assert len(conn.getFlightsMissingWeather()) == 1
+
+
+def randomFlights(size: int, seed=0) -> list:
+    rng = random.Random(seed)
+    flights = []
+    for i in range(size):
+        scheduled = datetime(2024, 1, 1) + timedelta(minutes=rng.randint(0, 60 * 24 * 30), seconds=rng.randint(0, 59))
+        flight = {
+            "number": str(i), "status": "departed", "scheduledDep": scheduled,
+            "actualDep": scheduled + timedelta(minutes=rng.randint(-10, 120), seconds=rng.randint(0, 59))
+            if rng.random() < 0.9 else None,
+            "airportDep": rng.choice(["MXP", "NRT", "BOG"]), "airportArr": rng.choice(["FCO", "JFK"]),
+        }
+        if rng.random() < 0.9:
+            flight["wind_speed_100m"] = round(rng.random() * 30, 2)
+        if rng.random() < 0.9:
+            flight["precipitation"] = rng.choice([0.0, 0.0, 0.1, 0.5, 2.0])
+        flights.append(flight)
+    return flights
+
+
+def test_backends_missing_a_method_can_not_be_created():
+    class PartialStorage(FlightStorage):
+        def airportReport(self) -> list:
+            return []
+
+    with pytest.raises(TypeError):
+        PartialStorage()
+
+
+@pytest.mark.parametrize("uri", ["mongomock://", "sqlite:///:memory:"])
+def test_backends_implement_the_storage_interface(uri):
+    assert isinstance(openStorage(uri), FlightStorage)
+
+
+def test_mongomock_report_matches_sqlite():
+    flights = randomFlights(500)
+    mock = openStorage("mongomock://")
+    mock.itemColl.insert_many([dict(flight) for flight in flights])
+    embedded = openStorage("sqlite:///:memory:")
+    # the weather stats are stored with the flights
+    embedded.bulkUpsertFlights(flights)
+
+    expected = {row["airport"]: row for row in embedded.airportReport()}
+    report = {row["airport"]: row for row in mock.airportReport()}
+    assert report.keys() == expected.keys()
+    for airport, row in report.items():
+        assert row == pytest.approx(expected[airport], nan_ok=True)
+
+
+@pytest.mark.parametrize("uri", ["mongomock://", "sqlite:///:memory:"])
+def test_flights_leaving_the_retry_window_are_no_more_pending(uri):
+    conn = openStorage(uri)
+    flights = []
+    for i, scheduled in enumerate([datetime(2024, 1, 1, 10), datetime(2024, 3, 1, 10), datetime(2024, 3, 2, 10)]):
+        flights.append({"number": str(i), "status": "departed", "scheduledDep": scheduled,
+                        "actualDep": scheduled + timedelta(minutes=20), "airportDep": "MXP", "airportArr": "FCO"})
+    conn.bulkUpsertFlights(flights)
+    assert len(conn.getFlightsMissingWeather()) == 3
+
+    assert conn.expirePendingWeather(datetime(2024, 2, 1)) == 1
+
+    pending = conn.getFlightsMissingWeather()
+    assert sorted(flight["scheduledDep"].day for flight in pending) == [1, 2]
+    # the expired flight is in a terminal state, it is not flagged again
+    conn.markPendingWeather()
+    assert len(conn.getFlightsMissingWeather()) == 2
+    unavailable = [flight for batch in conn.iterFlights() for flight in batch if flight.get("weatherUnavailable")]
+    assert len(unavailable) == 1
+    assert "weatherPending" not in unavailable[0]